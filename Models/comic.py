@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel
 
@@ -16,6 +16,13 @@ class BaseComicInfo(BaseModel):
     name: str
 
 
+class ComicSuggestion(BaseComicInfo):
+    """ComicSuggestion"""
+
+    """漫画源，漫画所属的漫画源"""
+    source: str
+
+
 class ComicInfo(BaseModel):
     """ComicInfo"""
 
@@ -41,3 +48,75 @@ class ComicInfo(BaseModel):
     updated_at: int | None = None
     """阅读量，漫画阅读量"""
     views: int | None = None
+
+
+class AlbumResult(BaseModel):
+    """AlbumResult"""
+
+    """漫画源，漫画所属的漫画源"""
+    source: str
+    """标识符，漫画在所属平台的索引ID"""
+    album_id: str
+    """状态，获取该漫画的执行结果"""
+    status: Literal["ok", "timeout", "error"]
+    """漫画，获取成功时的漫画信息"""
+    album: ComicInfo | None = None
+    """消息，获取失败时的错误信息"""
+    message: str | None = None
+
+
+class ComicImage(BaseModel):
+    """ComicImage"""
+
+    """地址，漫画图片URL"""
+    url: str
+    """请求头，获取图片时需要携带的请求头"""
+    headers: dict[str, str] | None = None
+    """还原参数，传递给图片还原器的参数，为空时图片无需还原"""
+    shaper: dict[str, Any] | None = None
+
+
+class SourceStatus(BaseModel):
+    """SourceStatus"""
+
+    """状态，漫画源本次请求的执行结果"""
+    status: Literal["ok", "timeout", "error"]
+    """数量，漫画源返回的结果数量"""
+    count: int = 0
+    """消息，漫画源请求失败时的错误信息"""
+    message: str | None = None
+
+
+class ComicSearchResult(BaseModel):
+    """ComicSearchResult"""
+
+    """漫画，所有漫画源返回的搜索结果"""
+    comics: list[BaseComicInfo]
+    """漫画源，每个漫画源的执行状态"""
+    sources: dict[str, SourceStatus]
+    """游标，获取下一页结果时携带，为空时没有更多结果"""
+    next_cursor: str | None = None
+    """本地，结果是否来自本地索引"""
+    local: bool = False
+
+
+class SearchBatch(BaseModel):
+    """SearchBatch"""
+
+    """类型，流式搜索帧类型"""
+    type: Literal["batch"] = "batch"
+    """漫画源，本批结果所属的漫画源"""
+    source: str
+    """状态，漫画源的执行状态"""
+    status: SourceStatus
+    """漫画，漫画源返回的搜索结果"""
+    comics: list[BaseComicInfo]
+
+
+class SearchSummary(BaseModel):
+    """SearchSummary"""
+
+    """类型，流式搜索帧类型"""
+    type: Literal["summary"] = "summary"
+    """漫画源，每个漫画源的执行状态"""
+    sources: dict[str, SourceStatus]
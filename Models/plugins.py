@@ -1,15 +1,22 @@
 import asyncio
 import inspect
 from abc import ABC, abstractmethod
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import nest_asyncio
+import httpx
 
-from Models.comic import BaseComicInfo, ComicInfo
+from Models.comic import BaseComicInfo, ComicImage, ComicInfo
 from Models.response import StandardResponse
 from Models.user import UserData
+from Services.Http.http import http_clients
 
-nest_asyncio.apply()
+if TYPE_CHECKING:
+    from Services.Modulator.guard import CallGuard
+    from Services.Modulator.singleflight import SingleFlight
+    from Services.Modulator.worker import WorkerPool
 
 
 class BasePlugin(ABC):
@@ -22,13 +29,21 @@ class BasePlugin(ABC):
         pass
 
     @abstractmethod
-    def search(self, keyword: str, **kwargs) -> list[BaseComicInfo]:
+    def search(self, keyword: str, page: int = 1, **kwargs) -> list[BaseComicInfo]:
+        """`page` starts at 1, later pages are only asked for by paged searches."""
         pass
 
     @abstractmethod
     def album(self, album_id: str, **kwargs) -> ComicInfo:
         pass
 
+    def http_client(self, source: str | None = None) -> httpx.AsyncClient:
+        """
+        Pooled client shared with the rest of the server, for use in async
+        methods. Pass a source id to pick up its `[http.sources]` settings.
+        """
+        return http_clients.get(source)
+
 
 class IAuth(ABC):
     auto_login: bool
@@ -39,13 +54,73 @@ class IAuth(ABC):
     ) -> StandardResponse:
         pass
 
+    async def album_state(
+        self, user_data: UserData, album_id: str
+    ) -> dict[str, Any] | None:
+        """`is_favorite` and `is_viewed` of an album for a user, never cached."""
+        return None
+
+
+class IReader(ABC):
+    @abstractmethod
+    def chapter_images(
+        self, album_id: str, chapter_id: str, **kwargs
+    ) -> list[ComicImage]:
+        pass
+
+
+class IBatch(ABC):
+    # Albums missing from the result are reported as not found
+    @abstractmethod
+    def albums(self, album_ids: list[str], **kwargs) -> dict[str, ComicInfo]:
+        pass
+
 
 class IShaper(ABC):
+    # Runs in a worker process, so it must not rely on the plugin instance
+    @staticmethod
     @abstractmethod
-    def imager_shaper(self):
+    def imager_shaper(image: bytes, **kwargs) -> bytes:
         pass
 
 
+class PluginCapabilities:
+    """
+    Plugin Capabilities
+    ~~~~~~~~~~~~~~~~~~~~~~
+    What a plugin instance supports, resolved once when it is loaded.
+    """
+
+    auth: bool
+    auto_login: bool
+    reader: bool
+    batch: bool
+    shaper: bool
+    login: list[str]
+
+    def __init__(
+        self,
+        instance: BasePlugin,
+        service: dict[str, list[str]],
+        interfaces: dict[str, bool] | None = None,
+    ) -> None:
+        # Plugins running in worker processes report their interfaces themselves
+        if interfaces is None:
+            interfaces = {
+                "auth": isinstance(instance, IAuth),
+                "reader": isinstance(instance, IReader),
+                "batch": isinstance(instance, IBatch),
+                "shaper": isinstance(instance, IShaper),
+            }
+        self.auth = interfaces["auth"]
+        self.auto_login = self.auth and bool(getattr(instance, "auto_login", False))
+        self.reader = interfaces["reader"]
+        self.batch = interfaces["batch"]
+        self.shaper = interfaces["shaper"]
+        login = service.get("login")
+        self.login = login if isinstance(login, list) else []
+
+
 class Plugin:
     name: str
     version: str
@@ -53,6 +128,13 @@ class Plugin:
     source: list[str]
     service: dict[str, list[str]]
     instance: BasePlugin
+    capabilities: PluginCapabilities
+    executor: ThreadPoolExecutor
+    path: Path | None
+    workers: "WorkerPool | None"
+    guard: "CallGuard | None"
+    flights: "SingleFlight | None"
+    active: int
 
     def __init__(
         self,
@@ -62,6 +144,12 @@ class Plugin:
         source: list[str],
         service: dict[str, list[str]],
         instance: BasePlugin,
+        max_workers: int = 4,
+        path: Path | None = None,
+        workers: "WorkerPool | None" = None,
+        interfaces: dict[str, bool] | None = None,
+        guard: "CallGuard | None" = None,
+        flights: "SingleFlight | None" = None,
     ):
         self.name = name
         self.version = version
@@ -69,15 +157,86 @@ class Plugin:
         self.source = source
         self.service = service
         self.instance = instance
-
-    def try_call(self, method: str, *args: Any, **kwargs: Any) -> Any:
-        if hasattr(self.instance, method):
-            if inspect.iscoroutinefunction(getattr(self.instance, method)):
-                loop = asyncio.get_event_loop()
-                return loop.run_until_complete(
-                    getattr(self.instance, method)(*args, **kwargs)
+        self.capabilities = PluginCapabilities(instance, service, interfaces)
+        # Sync plugin methods get their own threads, a slow plugin can't starve the others
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"plugin-{name}"
+        )
+        self.path = path
+        self.workers = workers
+        self.guard = guard
+        self.flights = flights
+        self.active = 0
+        self._idle: asyncio.Event | None = None
+
+    async def _invoke(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        func = getattr(self.instance, method)
+        if inspect.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(func, *args, **kwargs)
+        )
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # A thread can't be interrupted, the call only ends once it returns
+            await asyncio.wait([future])
+            if not future.cancelled():
+                future.exception()
+            raise
+
+    async def _guarded(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        if self.guard is None:
+            return await self._invoke(method, *args, **kwargs)
+        return await self.guard.run(partial(self._invoke, method, *args, **kwargs))
+
+    async def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        self.active += 1
+        try:
+            if (
+                self.flights is not None
+                and (key := self.flights.key(method, args, kwargs)) is not None
+            ):
+                return await self.flights.do(
+                    key, partial(self._guarded, method, *args, **kwargs)
                 )
-            else:
-                return getattr(self.instance, method)(*args, **kwargs)
+            return await self._guarded(method, *args, **kwargs)
+        finally:
+            self.active -= 1
+            if not self.active and self._idle is not None:
+                self._idle.set()
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait for in-flight calls to finish, returns False if some are still running."""
+        if not self.active:
+            return True
+        self._idle = asyncio.Event()
+        try:
+            async with asyncio.timeout(timeout):
+                await self._idle.wait()
+        except TimeoutError:
+            return False
+        return True
+
+    async def try_call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        if hasattr(self.instance, method):
+            return await self.call(method, *args, **kwargs)
         else:
             return None
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def unload(self, timeout: float = 30.0) -> None:
+        task = asyncio.ensure_future(self._invoke("on_unload"))
+        try:
+            # A hung on_unload, or a worker that stopped replying, can't stall shutdown
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if not done:
+                task.cancel()
+                raise TimeoutError(f"on_unload() of {self.name} timed out")
+            task.result()
+        finally:
+            self.shutdown()
+            if self.workers is not None:
+                await self.workers.close()
@@ -10,3 +10,15 @@ class ComicSearchReq(BaseModel):
     sources: list[str]
     keyword: str
     extras: dict[str, str] | None = None
+    cursor: str | None = None
+    limit: int | None = None
+    local: bool = False
+
+
+class AlbumRef(BaseModel):
+    source: str
+    album_id: str
+
+
+class ComicAlbumsReq(BaseModel):
+    albums: list[AlbumRef]
@@ -1,7 +1,9 @@
+from typing import Any
+
 from fastapi import HTTPException, Request, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from pydantic import BaseModel
 
 
@@ -17,13 +19,18 @@ class BaseResponse[T](BaseModel):
     data: T | None = None
 
 
-class StandardResponse[T](JSONResponse):
+class StandardResponse[T](Response):
     """
     Standard Response Class
     ~~~~~~~~~~~~~~~~~~~~~~
-    This class is the default web response of the API.
+    This class is the default web response of the API. The body is encoded
+    straight to JSON bytes by pydantic in a single pass, `data` is kept as
+    given for the server's own use.
     """
 
+    media_type = "application/json"
+    data: T | None
+
     def __init__(
         self,
         status_code: int = 200,
@@ -31,10 +38,12 @@ class StandardResponse[T](JSONResponse):
         data: T | None = None,
         headers: dict[str, str] | None = None,
     ) -> None:
+        self.data = data
+        body = BaseResponse[Any].model_construct(
+            status_code=status_code, message=message, data=data
+        )
         super().__init__(
-            content=BaseResponse[T](
-                status_code=status_code, message=message, data=data
-            ).model_dump(mode="json"),
+            content=body.model_dump_json(),
             status_code=status_code,
             headers=headers,
         )
@@ -45,6 +54,14 @@ class PluginResponse(BaseModel):
     items: list[str] | None = None
 
 
+class SourceDetail(BaseModel):
+    plugin: str
+    version: str
+    loaded: bool
+    capabilities: list[str] = []
+    breaker: dict[str, Any] | None = None
+
+
 async def http_exception_handler(
     request: Request, exc: HTTPException
 ) -> StandardResponse[None]:
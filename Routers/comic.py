@@ -1,35 +1,152 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import AsyncIterator
 
-from Models.comic import BaseComicInfo, ComicInfo
-from Models.requests import ComicSearchReq
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+
+from Models.comic import (
+    AlbumResult,
+    BaseComicInfo,
+    ComicImage,
+    ComicInfo,
+    ComicSearchResult,
+    ComicSuggestion,
+    SearchBatch,
+    SearchSummary,
+    SourceStatus,
+)
+from Models.plugins import Plugin
+from Models.requests import ComicAlbumsReq, ComicSearchReq
 from Models.response import BaseResponse, StandardResponse
 from Models.user import User, UserData
+from Services.Cache.album import album_cache
+from Services.Cache.cache import cache
+from Services.Cache.search import search_cache
+from Services.Config.config import config
+from Services.Image.image import CachedImage, image_store
+from Services.Image.shaper import image_shaper
+from Services.Index.index import comic_index
+from Services.Modulator.dispatcher import fetch_albums, search_sources
 from Services.Modulator.manager import plugin_manager
-from Services.Security.user import get_current_user, get_user_data
+from Services.Security.user import (
+    get_current_user,
+    get_optional_user_data,
+    get_user_data,
+)
 
 comic_router = APIRouter(prefix="/comic")
 
+# Pages are addressed by content and never change once cached
+IMAGE_CACHE_HEADERS = {"Cache-Control": "private, max-age=31536000, immutable"}
+
 
-@comic_router.post("/search", response_model=BaseResponse[list[BaseComicInfo]])
+@comic_router.post("/search", response_model=BaseResponse[ComicSearchResult])
 async def search_comic(
     body: ComicSearchReq, user: User = Depends(get_current_user)
-) -> StandardResponse[list[BaseComicInfo]]:
-    # TODO: Performence imporvement
-    result = []
-    for source in plugin_manager.plugins:
-        resp = source.instance.search(body.keyword, *body.extras)
+) -> StandardResponse[ComicSearchResult]:
+    search_cache.check_limit(body.limit)
+    if body.local and body.cursor is None:
+        limit = body.limit or config.index.local_min_hits
+        hits = comic_index.search(body.keyword, body.sources, limit, prefix=False)
+        # Only answered locally when the index knows enough, otherwise ask the sources
+        if hits and len(hits) >= min(limit, config.index.local_min_hits):
+            counts = {src: 0 for src in dict.fromkeys(body.sources)}
+            for src, _ in hits:
+                counts[src] += 1
+            result = ComicSearchResult(
+                comics=[comic for _, comic in hits],
+                sources={
+                    src: SourceStatus(status="ok", count=count)
+                    for src, count in counts.items()
+                },
+                local=True,
+            )
+            return StandardResponse[ComicSearchResult](data=result)
+
+    return StandardResponse[ComicSearchResult](data=await search_cache.search(body))
+
+
+@comic_router.get("/suggest", response_model=BaseResponse[list[ComicSuggestion]])
+async def suggest_comic(
+    q: str,
+    sources: list[str] | None = Query(default=None),
+    user: User = Depends(get_current_user),
+) -> StandardResponse[list[ComicSuggestion]]:
+    hits = comic_index.search(q, sources, config.index.suggest_limit)
+    return StandardResponse[list[ComicSuggestion]](
+        data=[ComicSuggestion(source=src, **comic.model_dump()) for src, comic in hits]
+    )
+
+
+@comic_router.post("/search/stream", response_class=StreamingResponse)
+async def search_comic_stream(
+    body: ComicSearchReq,
+    accept: str | None = Header(default=None),
+    user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    sse = accept is not None and "text/event-stream" in accept
 
-        result.extend(resp)
+    def encode(frame: BaseModel, event: str) -> str:
+        if sse:
+            return f"event: {event}\ndata: {frame.model_dump_json()}\n\n"
+        return frame.model_dump_json() + "\n"
 
-    return StandardResponse[list[BaseComicInfo]](data=result)
+    async def frames() -> AsyncIterator[str]:
+        statuses: dict[str, SourceStatus] = {}
+        async for src, status, resp in search_sources(
+            body.sources, body.keyword, body.extras
+        ):
+            statuses[src] = status
+            yield encode(SearchBatch(source=src, status=status, comics=resp), "batch")
+        yield encode(SearchSummary(sources=statuses), "summary")
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @comic_router.get("/{src_id}/album/{album_id}", response_model=BaseResponse[ComicInfo])
-async def get_album(src_id: str, album_id: str) -> StandardResponse[ComicInfo]:
-    if (source := plugin_manager.get_source(src_id)) is None:
+async def get_album(
+    src_id: str,
+    album_id: str,
+    user_data: UserData | None = Depends(get_optional_user_data),
+) -> StandardResponse[ComicInfo]:
+    if (source := await plugin_manager.get_source(src_id)) is None:
         raise HTTPException(status_code=404, detail="Source not found")
 
-    return StandardResponse[ComicInfo](data=source.instance.album(album_id))
+    album = await album_cache.get(
+        src_id, album_id, lambda: source.call("album", album_id)
+    )
+    # Per-user fields never go through the cache, they are asked for on every request
+    if user_data is not None and source.capabilities.auth:
+        album = album_cache.personalize(
+            album, await source.try_call("album_state", user_data, album_id)
+        )
+    return StandardResponse[ComicInfo](data=album)
+
+
+@comic_router.post("/albums", response_model=BaseResponse[dict[str, AlbumResult]])
+async def get_albums(body: ComicAlbumsReq) -> StandardResponse[dict[str, AlbumResult]]:
+    if len(body.albums) > config.plugin.batch_limit:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {config.plugin.batch_limit} albums per request",
+        )
+
+    return StandardResponse[dict[str, AlbumResult]](
+        data=await fetch_albums(body.albums)
+    )
+
+
+def _index_favor(src_id: str, resp: Response) -> None:
+    if not isinstance(resp, StandardResponse) or resp.status_code != 200:
+        return
+    if isinstance(resp.data, list):
+        comic_index.add(
+            src_id, [comic for comic in resp.data if isinstance(comic, BaseComicInfo)]
+        )
 
 
 @comic_router.get("/{src_id}/favor", response_model=BaseResponse[list[BaseComicInfo]])
@@ -38,20 +155,104 @@ async def get_favor(
     data: dict[str, str] | None = None,
     user_data: UserData = Depends(get_user_data),
 ) -> StandardResponse[list[BaseComicInfo]]:
-    if (source := plugin_manager.get_source(src_id)) is None:
+    if (source := await plugin_manager.get_source(src_id)) is None:
         raise HTTPException(status_code=404, detail="Source not found")
 
-    if (resp := source.try_call("get_favor", user_data, data)) is not None:
+    if (resp := await source.try_call("get_favor", user_data, data)) is not None:
+        _index_favor(src_id, resp)
         return resp
 
     return StandardResponse(status_code=400, message="Source not support")
 
 
-@comic_router.get("/{src_id}/album/{album_id}/images/{chapter_id}")
+async def _get_chapter(
+    source: Plugin, src_id: str, album_id: str, chapter_id: str
+) -> list[ComicImage]:
+    if not source.capabilities.reader:
+        raise HTTPException(status_code=400, detail="Source not support")
+
+    key = f"chapter_{src_id}_{album_id}_{chapter_id}"
+    if (cached := await cache.get(key, namespace="chapter")) is not None:
+        return [ComicImage.model_validate(image) for image in cached]
+
+    images: list[ComicImage] = await source.call("chapter_images", album_id, chapter_id)
+    await cache.set(
+        key,
+        [image.model_dump() for image in images],
+        ttl=config.image.chapter_ttl,
+        namespace="chapter",
+    )
+    return images
+
+
+def _cached_page(cached: CachedImage) -> FileResponse:
+    return FileResponse(
+        cached.path,
+        media_type=cached.media_type,
+        headers={**IMAGE_CACHE_HEADERS, "ETag": f'"{cached.digest}"'},
+    )
+
+
+@comic_router.get(
+    "/{src_id}/album/{album_id}/images/{chapter_id}",
+    response_model=BaseResponse[list[str]],
+)
 async def get_chapter_images(
-    src_id: str, album_id: str, chapter_id: str, user: User = Depends(get_current_user)
-):
-    if (source := plugin_manager.get_source(src_id)) is None:
+    request: Request,
+    src_id: str,
+    album_id: str,
+    chapter_id: str,
+    user: User = Depends(get_current_user),
+) -> StandardResponse[list[str]]:
+    if (source := await plugin_manager.get_source(src_id)) is None:
         raise HTTPException(status_code=404, detail="Source not found")
 
-    pass
+    images = await _get_chapter(source, src_id, album_id, chapter_id)
+    return StandardResponse[list[str]](
+        data=[
+            str(
+                request.url_for(
+                    "get_chapter_page",
+                    src_id=src_id,
+                    album_id=album_id,
+                    chapter_id=chapter_id,
+                    page=page,
+                )
+            )
+            for page in range(len(images))
+        ]
+    )
+
+
+@comic_router.get("/{src_id}/album/{album_id}/images/{chapter_id}/{page}")
+async def get_chapter_page(
+    src_id: str,
+    album_id: str,
+    chapter_id: str,
+    page: int,
+    user: User = Depends(get_current_user),
+) -> Response:
+    if (source := await plugin_manager.get_source(src_id)) is None:
+        raise HTTPException(status_code=404, detail="Source not found")
+
+    key = image_store.page_key(src_id, album_id, chapter_id, page)
+    if (cached := await image_store.lookup(key)) is not None:
+        return _cached_page(cached)
+
+    images = await _get_chapter(source, src_id, album_id, chapter_id)
+    if not 0 <= page < len(images):
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    if source.capabilities.shaper and images[page].shaper is not None:
+        if (
+            shaped := await image_shaper.shape(
+                source, src_id, album_id, chapter_id, page, images
+            )
+        ) is None:
+            raise HTTPException(status_code=502, detail="Failed to shape image")
+        return _cached_page(shaped)
+
+    if (cached := await image_store.join(key)) is not None:
+        return _cached_page(cached)
+    media_type, body = await image_store.open(key, images[page], src_id)
+    return StreamingResponse(body, media_type=media_type, headers=IMAGE_CACHE_HEADERS)
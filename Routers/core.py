@@ -1,6 +1,12 @@
-from fastapi import APIRouter
+import secrets
+from pathlib import Path
+from typing import Annotated, Any
 
-from Models.response import BaseResponse, StandardResponse
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from Models.response import BaseResponse, SourceDetail, StandardResponse
+from Services.Config.config import config
+from Services.Metrics.metrics import metrics
 from Services.Modulator.manager import plugin_manager
 
 core_router = APIRouter(prefix="/core")
@@ -13,10 +19,77 @@ def get_status() -> StandardResponse[None]:
 
 @core_router.get("/sources", response_model=BaseResponse[set[str]])
 def get_sources() -> StandardResponse[set[str]]:
-    sources = plugin_manager.registered_source
+    sources = plugin_manager.registered_sources()
     return StandardResponse[set[str]](data=sources)
 
 
+@core_router.get(
+    "/sources/detail", response_model=BaseResponse[dict[str, SourceDetail]]
+)
+def get_source_details() -> StandardResponse[dict[str, SourceDetail]]:
+    return StandardResponse[dict[str, SourceDetail]](
+        data=plugin_manager.source_details()
+    )
+
+
 @core_router.get("/protocol", response_model=BaseResponse[str])
 def get_cnm_version() -> StandardResponse[str]:
     return StandardResponse[str](data=plugin_manager.cnm_version.__str__())
+
+
+def verify_admin_token(x_admin_token: Annotated[str | None, Header()] = None) -> None:
+    if config.plugin.admin_token is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token, config.plugin.admin_token
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@core_router.get(
+    "/metrics",
+    response_model=BaseResponse[dict[str, Any]],
+    dependencies=[Depends(verify_admin_token)],
+)
+def get_metrics() -> StandardResponse[dict[str, Any]]:
+    return StandardResponse[dict[str, Any]](data=metrics.collect())
+
+
+@core_router.post(
+    "/plugins/{plugin_dir}/load",
+    response_model=BaseResponse,
+    dependencies=[Depends(verify_admin_token)],
+)
+async def load_plugin(plugin_dir: str) -> StandardResponse[None]:
+    path = Path("Plugins", plugin_dir).resolve()
+    if not plugin_dir.isidentifier() or not path.is_dir():
+        raise HTTPException(status_code=404, detail="Plugin not found")
+
+    if not await plugin_manager.add_plugin(path):
+        raise HTTPException(status_code=400, detail=f"Failed to load {plugin_dir}")
+    return StandardResponse(message=f"{plugin_dir} loaded")
+
+
+@core_router.post(
+    "/plugins/{name}/reload",
+    response_model=BaseResponse,
+    dependencies=[Depends(verify_admin_token)],
+)
+async def reload_plugin(name: str) -> StandardResponse[None]:
+    if name not in plugin_manager.plugins:
+        raise HTTPException(status_code=404, detail="Plugin not found")
+
+    if not await plugin_manager.reload_plugin(name):
+        raise HTTPException(status_code=400, detail=f"Failed to reload {name}")
+    return StandardResponse(message=f"{name} reloaded")
+
+
+@core_router.post(
+    "/plugins/{name}/unload",
+    response_model=BaseResponse,
+    dependencies=[Depends(verify_admin_token)],
+)
+async def unload_plugin(name: str) -> StandardResponse[None]:
+    if not await plugin_manager.unload_plugin(name):
+        raise HTTPException(status_code=404, detail="Plugin not found")
+    return StandardResponse(message=f"{name} unloaded")
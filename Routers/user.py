@@ -2,21 +2,22 @@ import json
 from datetime import datetime, timedelta
 from uuid import uuid4
 
-import bcrypt
 from fastapi import APIRouter, Depends, Form, Header, HTTPException, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from Models.database import PwdDb, UserDb
-from Models.plugins import IAuth
 from Models.requests import SourceStorageReq
 from Models.response import BaseResponse, PluginResponse, StandardResponse
 from Models.user import Token, TokenData, User, UserData
 from Services.Cache.cache import cache
+from Services.Cache.user import user_cache
 from Services.Database.database import get_db
-from Services.Limiter.limiter import freq_limiter
+from Services.Limiter.limiter import freq_limiter, get_client_address, route_limit
 from Services.Mail.mail import Purpose, get_normalized_email, send_captcha
 from Services.Modulator.manager import plugin_manager
+from Services.Security.password import password_hasher
 from Services.Security.user import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     create_access_token,
@@ -30,33 +31,43 @@ user_router = APIRouter(prefix="/user")
 
 
 @user_router.get("/captcha/register", response_model=BaseResponse[str])
-@freq_limiter.limit("1/minute")
+@freq_limiter.limit(route_limit("user_req_register_captcha", "1/minute"))
 async def user_req_register_captcha(
     request: Request, email: str
 ) -> StandardResponse[str]:
     normalized_email = get_normalized_email(email)
-    ip = request.client.host if request.client else "Unknown"
+    ip = get_client_address(request)
     captcha = send_captcha(normalized_email, Purpose.REGISTER, ip)
     request_id = uuid4().hex
-    await cache.set(key=f"{normalized_email}_{request_id}", value=captcha, ttl=300)
+    await cache.set(
+        key=f"{normalized_email}_{request_id}",
+        value=captcha,
+        ttl=300,
+        namespace="captcha",
+    )
     return StandardResponse[str](message="Captcha sent", data=request_id)
 
 
 @user_router.get("/captcha/recover", response_model=BaseResponse[str])
-@freq_limiter.limit("1/minute")
+@freq_limiter.limit(route_limit("user_req_recover_captcha", "1/minute"))
 async def user_req_recover_captcha(
     request: Request, email: str
 ) -> StandardResponse[str]:
     normalized_email = get_normalized_email(email)
-    ip = request.client.host if request.client else "Unknown"
+    ip = get_client_address(request)
     captcha = send_captcha(normalized_email, Purpose.RECOVER_PASSWORD, ip)
     request_id = uuid4().hex
-    await cache.set(key=f"{normalized_email}_{request_id}", value=captcha, ttl=300)
+    await cache.set(
+        key=f"{normalized_email}_{request_id}",
+        value=captcha,
+        ttl=300,
+        namespace="captcha",
+    )
     return StandardResponse[str](message="Captcha sent", data=request_id)
 
 
 @user_router.post("/register", response_model=BaseResponse, status_code=201)
-@freq_limiter.limit("10/minute")
+@freq_limiter.limit(route_limit("user_reg", "10/minute"))
 async def user_reg(
     request: Request,
     email: str = Form(),
@@ -64,55 +75,61 @@ async def user_reg(
     password: str = Form(),
     captcha: str = Form(),
     request_id: str = Header(convert_underscores=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> StandardResponse[None]:
     normalized_email = get_normalized_email(email)
     if password.strip().__len__() < 6:
         raise HTTPException(status_code=400, detail="Password too short")
     if (
-        db.query(UserDb)
-        .filter((UserDb.email == normalized_email) | (UserDb.username == username))
-        .first()
+        await db.scalar(
+            select(UserDb).where(
+                (UserDb.email == normalized_email) | (UserDb.username == username)
+            )
+        )
         is not None
     ):
         raise HTTPException(status_code=409, detail="User already exists")
 
     if (
-        cached_captcha := await cache.get(f"{normalized_email}_{request_id}")
+        cached_captcha := await cache.get(
+            f"{normalized_email}_{request_id}", namespace="captcha"
+        )
     ) is None or cached_captcha != captcha:
         raise HTTPException(status_code=400, detail="Invalid captcha")
 
-    await cache.delete(f"{normalized_email}_{request_id}")
+    await cache.delete(f"{normalized_email}_{request_id}", namespace="captcha")
 
     db.add(
         UserDb(
             user_id=uuid4().hex,
             email=email,
             username=username,
-            password=bcrypt.hashpw(bytes(password, "utf-8"), bcrypt.gensalt()).decode(),
+            password=await password_hasher.hash(password),
             created_at=datetime.now(),
         )
     )
-    db.commit()
+    await db.commit()
     return StandardResponse[None](status_code=201, message="User created")
 
 
 @user_router.post("/login", response_model=BaseResponse[Token])
-@freq_limiter.limit("10/minute")
-def user_login(
+@freq_limiter.limit(route_limit("user_login", "10/minute"))
+async def user_login(
     request: Request,
     body: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> StandardResponse[Token]:
-    user: UserDb | None = (
-        db.query(UserDb).filter(UserDb.username == body.username).first()
+    user: UserDb | None = await db.scalar(
+        select(UserDb).where(UserDb.username == body.username)
     )
 
-    if user is None or not bcrypt.checkpw(
-        bytes(body.password, "utf-8"), bytes(user.password, "utf-8")
-    ):
+    if user is None or not await password_hasher.verify(body.password, user.password):
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
+    if password_hasher.needs_rehash(user.password):
+        user.password = await password_hasher.hash(body.password)
+        await db.commit()
+
     token = create_access_token(
         data=TokenData(sub=user.username, id=user.user_id),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
@@ -121,16 +138,16 @@ def user_login(
 
 
 @user_router.post("/recover", response_model=BaseResponse)
-@freq_limiter.limit("10/minute")
+@freq_limiter.limit(route_limit("user_recover", "10/minute"))
 async def user_recover(
     request: Request,
     email: str = Form(),
     password: str = Form(),
     captcha: str = Form(),
     request_id: str = Header(convert_underscores=True),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> StandardResponse[str]:
-    if (record := db.query(UserDb).filter(UserDb.email == email).first()) is None:
+    if (record := await db.scalar(select(UserDb).where(UserDb.email == email))) is None:
         raise HTTPException(status_code=404, detail="User not found")
 
     normalized_email = get_normalized_email(email)
@@ -138,17 +155,18 @@ async def user_recover(
         raise HTTPException(status_code=400, detail="Password too short")
 
     if (
-        cached_captcha := await cache.get(f"{normalized_email}_{request_id}")
+        cached_captcha := await cache.get(
+            f"{normalized_email}_{request_id}", namespace="captcha"
+        )
     ) is None or cached_captcha != captcha:
         raise HTTPException(status_code=400, detail="Invalid captcha")
 
-    await cache.delete(f"{normalized_email}_{request_id}")
+    await cache.delete(f"{normalized_email}_{request_id}", namespace="captcha")
 
-    record.password = bcrypt.hashpw(bytes(password, "utf-8"), bcrypt.gensalt()).decode(
-        "utf-8"
-    )
+    record.password = await password_hasher.hash(password)
     username = record.username
-    db.commit()
+    await db.commit()
+    user_cache.delete(record.user_id)
 
     return StandardResponse[str](message="Password recovered", data=username)
 
@@ -161,11 +179,11 @@ def user_profile(
 
 
 @user_router.get("/{src}/login", response_model=BaseResponse[PluginResponse])
-def user_src_auth_info(src: str):
-    if (source := plugin_manager.get_source(src)) is None:
+async def user_src_auth_info(src: str):
+    if (source := await plugin_manager.get_source(src)) is None:
         raise HTTPException(status_code=404, detail="Source not found")
 
-    if not isinstance(source.instance, IAuth):
+    if not source.capabilities.auth:
         return StandardResponse[PluginResponse](data=PluginResponse(required=False))
 
     return StandardResponse[PluginResponse](
@@ -180,13 +198,13 @@ async def user_src_login(
     body: dict[str, str],
     user_data: UserData = Depends(get_user_data),
 ) -> StandardResponse[object]:
-    if (source := plugin_manager.get_source(src)) is None:
+    if (source := await plugin_manager.get_source(src)) is None:
         raise HTTPException(status_code=404, detail="Source not found")
 
-    if not isinstance(source.instance, IAuth):
+    if not source.capabilities.auth:
         raise HTTPException(status_code=400, detail="Invalid source")
 
-    result = await source.instance.login(body, user_data)
+    result = await source.call("login", body, user_data)
     if result.status_code != 200:
         raise HTTPException(status_code=400, detail=f"Failed to login to source {src}")
 
@@ -200,22 +218,22 @@ async def user_src_login(
 async def user_encrypt_src_data(
     src: str,
     body: SourceStorageReq,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
     user_data: UserData = Depends(get_user_data),
 ) -> StandardResponse[None]:
-    if (source := plugin_manager.get_source(src)) is None:
+    if (source := await plugin_manager.get_source(src)) is None:
         raise HTTPException(status_code=404, detail="Source not found")
 
-    if not isinstance(source.instance, IAuth) or not source.instance.auto_login:
+    if not source.capabilities.auto_login:
         raise HTTPException(status_code=400, detail="Invalid source")
 
     if (
-        record := db.query(PwdDb)
-        .filter(PwdDb.source == src, PwdDb.user_id == user.user_id)
-        .first()
+        record := await db.scalar(
+            select(PwdDb).where(PwdDb.source == src, PwdDb.user_id == user.user_id)
+        )
     ) is not None:
-        result = await source.instance.login(body.data, user_data)
+        result = await source.call("login", body.data, user_data)
         if result.status_code != 200:
             raise HTTPException(status_code=400, detail="Invalid source data")
 
@@ -229,7 +247,7 @@ async def user_encrypt_src_data(
             )
         )
 
-    db.commit()
+    await db.commit()
     return StandardResponse[None](message=f"{src} auth data saved")
 
 
@@ -238,30 +256,26 @@ async def user_src_autologin(
     response: Response,
     src: str,
     password: str = Form(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
     user_data: UserData = Depends(get_user_data),
 ) -> StandardResponse[object]:
-    if (source := plugin_manager.get_source(src)) is None:
+    if (source := await plugin_manager.get_source(src)) is None:
         raise HTTPException(status_code=404, detail="Source not found")
 
-    if (
-        not isinstance(source.instance, IAuth)
-        or not isinstance(source.service.get("login"), list)
-        or source.service["login"] == []
-    ):
+    if not source.capabilities.auth or not source.capabilities.login:
         raise HTTPException(status_code=400, detail="Invalid source")
 
     if (
-        record := db.query(PwdDb)
-        .filter(PwdDb.source == src, PwdDb.user_id == user.user_id)
-        .first()
+        record := await db.scalar(
+            select(PwdDb).where(PwdDb.source == src, PwdDb.user_id == user.user_id)
+        )
     ) is None:
         raise HTTPException(status_code=404, detail="Source user not found")
 
     data = json.loads(decrypt_src_data(password, record.data))
 
-    result = await source.instance.login(data, user_data)
+    result = await source.call("login", data, user_data)
     if result.status_code != 200:
         raise HTTPException(
             status_code=400, detail=f"Failed to auto login to source {src}"
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from Models.comic import ComicInfo
+from Services.Cache.memory import MemoryCache, memory_cache
+from Services.Config.config import config
+from Services.Index.index import comic_index
+
+logger = logging.getLogger("[Cache]")
+
+# Fields depending on who is asking, they must never be served from a shared cache
+USER_FIELDS = {"is_favorite": None, "is_viewed": None}
+
+
+class AlbumCache:
+    """
+    Album Cache
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Per-source album metadata cache keyed by `(src_id, album_id)`. Entries
+    older than `ttl` but younger than `ttl + stale_ttl` are still served while
+    a background refresh fetches the new version. Without a `ttl` entries
+    never go stale. Albums are always handed out without their per-user
+    fields, whether they came from the cache or the source, `personalize`
+    fills those in for the requesting user.
+    """
+
+    def __init__(self, ttl: float | None, stale_ttl: float) -> None:
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._refreshing: dict[tuple[str, str], asyncio.Task[None]] = {}
+
+    def _source(self, src_id: str) -> MemoryCache[ComicInfo]:
+        return memory_cache(f"album:{src_id}")
+
+    def store(self, src_id: str, album_id: str, album: ComicInfo) -> ComicInfo:
+        """Cache `album` without its per-user fields and return the cached copy."""
+        shared = album.model_copy(update=USER_FIELDS)
+        comic_index.add_tags(src_id, album_id, album.tags)
+        # Kept until the stale window closes, freshness is decided in `lookup`
+        self._source(src_id).set(
+            album_id,
+            shared,
+            ttl=self.ttl + self.stale_ttl if self.ttl is not None else None,
+        )
+        return shared
+
+    async def _refresh(
+        self, src_id: str, album_id: str, fetch: Callable[[], Awaitable[ComicInfo]]
+    ) -> None:
+        try:
+            self.store(src_id, album_id, await fetch())
+        except Exception as e:
+            logger.warning(f"Failed to refresh album {src_id}/{album_id}: {e!r}")
+        finally:
+            self._refreshing.pop((src_id, album_id), None)
+
+    def lookup(
+        self, src_id: str, album_id: str, fetch: Callable[[], Awaitable[ComicInfo]]
+    ) -> ComicInfo | None:
+        """Cached album if still servable, a stale one is refreshed through `fetch`."""
+        lru = self._source(src_id)
+        if (entry := lru.peek(album_id)) is not None:
+            album, age = entry
+            if self.ttl is None or age < self.ttl:
+                lru.stats.hits += 1
+                return album
+            if age < self.ttl + self.stale_ttl:
+                lru.stats.hits += 1
+                key = (src_id, album_id)
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(
+                        self._refresh(src_id, album_id, fetch)
+                    )
+                return album
+
+        lru.stats.misses += 1
+        return None
+
+    async def get(
+        self, src_id: str, album_id: str, fetch: Callable[[], Awaitable[ComicInfo]]
+    ) -> ComicInfo:
+        if (album := self.lookup(src_id, album_id, fetch)) is not None:
+            return album
+        return self.store(src_id, album_id, await fetch())
+
+    @staticmethod
+    def personalize(album: ComicInfo, state: dict[str, Any] | None) -> ComicInfo:
+        """Copy of a shared album with the per-user fields taken from `state`."""
+        if not state:
+            return album
+        return album.model_copy(
+            update={field: state[field] for field in USER_FIELDS if field in state}
+        )
+
+    def invalidate(self, src_id: str, album_id: str | None = None) -> None:
+        lru = self._source(src_id)
+        if album_id is None:
+            lru.clear()
+        else:
+            lru.delete(album_id)
+
+
+album_cache = AlbumCache(
+    ttl=config.cache.namespace("album").ttl,
+    stale_ttl=config.cache.album_stale_ttl,
+)
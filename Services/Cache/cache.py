@@ -1,4 +1,27 @@
 from aiocache import Cache
+from aiocache.base import BaseCache
 from aiocache.serializers import JsonSerializer
 
-cache = Cache(Cache.MEMORY, serializer=JsonSerializer())
+from Services.Cache.memory import MemoryBackend
+from Services.Cache.sqlite import SQLiteCache
+from Services.Config.config import config
+
+
+def create_cache() -> BaseCache:
+    """Build the shared cache used across worker processes from `config.cache`."""
+    match config.cache.backend:
+        case "sqlite":
+            return SQLiteCache(
+                path=config.cache.sqlite_path,
+                sweep_interval=config.cache.sweep_interval,
+                serializer=JsonSerializer(),
+            )
+        case "redis":
+            redis = Cache.from_url(config.cache.redis_url)
+            redis.serializer = JsonSerializer()
+            return redis
+        case _:
+            return MemoryBackend()
+
+
+cache = create_cache()
@@ -0,0 +1,294 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Literal
+
+from aiocache.base import BaseCache
+from aiocache.serializers import NullSerializer
+
+from Services.Config.config import NamespaceConfig, config
+from Services.Metrics.metrics import metrics
+
+
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def snapshot(self) -> dict[str, int | float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "expires_at", "freq")
+
+    def __init__(self, value: Any, expires_at: float | None) -> None:
+        self.value = value
+        self.stored_at = time.monotonic()
+        self.expires_at = expires_at
+        self.freq = 1
+
+
+class MemoryCache[T]:
+    """
+    Memory Cache
+    ~~~~~~~~~~~~~~~~~~~~~~
+    A size-bounded in-process cache holding objects as they are, without any
+    serialization. Once `max_entries` is reached, expired entries are dropped
+    first and then the least recently used (`lru`) or least frequently used
+    (`lfu`) entry is evicted, both in O(1), before the new entry goes in.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float | None = None,
+        policy: Literal["lru", "lfu"] = "lru",
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.policy = policy
+        self.stats = CacheStats()
+        self._data: OrderedDict[Hashable, _Entry] = OrderedDict()
+        # LFU only: keys grouped by access count, each group in LRU order
+        self._freqs: dict[int, OrderedDict[Hashable, None]] = {}
+        self._min_freq = 0
+        # Earliest expiry among the entries, so a full cache only scans when one is due
+        self._next_expiry: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._live(key) is not None
+
+    def _touch(self, key: Hashable, entry: _Entry) -> None:
+        if self.policy == "lru":
+            self._data.move_to_end(key)
+            return
+        bucket = self._freqs[entry.freq]
+        del bucket[key]
+        if not bucket:
+            del self._freqs[entry.freq]
+            if self._min_freq == entry.freq:
+                self._min_freq += 1
+        entry.freq += 1
+        self._freqs.setdefault(entry.freq, OrderedDict())[key] = None
+
+    def _evict(self) -> None:
+        if self.policy == "lru":
+            self._data.popitem(last=False)
+        else:
+            if self._min_freq not in self._freqs:
+                self._min_freq = min(self._freqs)
+            bucket = self._freqs[self._min_freq]
+            key, _ = bucket.popitem(last=False)
+            if not bucket:
+                del self._freqs[self._min_freq]
+            del self._data[key]
+        self.stats.evictions += 1
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        if self._next_expiry is None or self._next_expiry > now:
+            return
+        self._next_expiry = None
+        for key, entry in list(self._data.items()):
+            if entry.expires_at is None:
+                continue
+            if entry.expires_at <= now:
+                self.delete(key)
+            else:
+                self._schedule(entry.expires_at)
+
+    def _schedule(self, expires_at: float | None) -> None:
+        if expires_at is not None and (
+            self._next_expiry is None or expires_at < self._next_expiry
+        ):
+            self._next_expiry = expires_at
+
+    def _live(self, key: Hashable) -> _Entry | None:
+        if (entry := self._data.get(key)) is None:
+            return None
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            self.delete(key)
+            return None
+        return entry
+
+    def peek(self, key: Hashable) -> tuple[T, float] | None:
+        """Return the value and its age, without touching stats."""
+        if (entry := self._live(key)) is None:
+            return None
+        self._touch(key, entry)
+        return entry.value, time.monotonic() - entry.stored_at
+
+    def get(self, key: Hashable) -> T | None:
+        if (entry := self._live(key)) is None:
+            self.stats.misses += 1
+            return None
+        self._touch(key, entry)
+        self.stats.hits += 1
+        return entry.value
+
+    def set(self, key: Hashable, value: T, ttl: float | None = None) -> None:
+        self.delete(key)
+        # Make room first, the incoming entry must never be the one evicted
+        if len(self._data) >= self.max_entries:
+            self._purge()
+        while self._data and len(self._data) >= self.max_entries:
+            self._evict()
+        ttl = ttl if ttl is not None else self.ttl
+        entry = self._data[key] = _Entry(value, time.monotonic() + ttl if ttl else None)
+        self._schedule(entry.expires_at)
+        if self.policy == "lfu":
+            self._freqs.setdefault(1, OrderedDict())[key] = None
+            self._min_freq = 1
+
+    def expire(self, key: Hashable, ttl: float | None) -> bool:
+        if (entry := self._live(key)) is None:
+            return False
+        entry.expires_at = time.monotonic() + ttl if ttl else None
+        self._schedule(entry.expires_at)
+        return True
+
+    def delete(self, key: Hashable) -> bool:
+        if (entry := self._data.pop(key, None)) is None:
+            return False
+        if self.policy == "lfu":
+            bucket = self._freqs[entry.freq]
+            del bucket[key]
+            if not bucket:
+                del self._freqs[entry.freq]
+        return True
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._freqs.clear()
+        self._min_freq = 0
+        self._next_expiry = None
+
+    def snapshot(self) -> dict[str, int | float]:
+        return {"size": len(self._data), **self.stats.snapshot()}
+
+
+memory_caches: dict[str, MemoryCache[Any]] = {}
+
+
+def memory_cache(
+    namespace: str, settings: NamespaceConfig | None = None
+) -> MemoryCache[Any]:
+    """Get the in-process cache of a namespace, creating it from config on first use."""
+    if (cache := memory_caches.get(namespace)) is None:
+        settings = settings or config.cache.namespace(namespace)
+        cache = memory_caches[namespace] = MemoryCache(
+            max_entries=settings.max_entries, ttl=settings.ttl, policy=settings.policy
+        )
+    return cache
+
+
+metrics.register(
+    "cache",
+    lambda: {namespace: cache.snapshot() for namespace, cache in memory_caches.items()},
+)
+
+
+class MemoryBackend(BaseCache):
+    """
+    Memory Backend
+    ~~~~~~~~~~~~~~~~~~~~~~
+    aiocache backend on top of the bounded `MemoryCache` namespaces, values
+    are kept as objects so nothing is encoded or decoded in-process.
+    """
+
+    NAME = "memory"
+
+    def __init__(self, serializer=None, **kwargs) -> None:
+        super().__init__(serializer=serializer or NullSerializer(), **kwargs)
+
+    def _build_key(self, key, namespace=None):
+        return namespace or self.namespace or "default", key
+
+    async def _get(self, key, encoding="utf-8", _conn=None):
+        namespace, key = key
+        return memory_cache(namespace).get(key)
+
+    async def _gets(self, key, encoding="utf-8", _conn=None):
+        return await self._get(key, encoding=encoding, _conn=_conn)
+
+    async def _multi_get(self, keys, encoding="utf-8", _conn=None):
+        return [await self._get(key) for key in keys]
+
+    async def _set(self, key, value, ttl=None, _cas_token=None, _conn=None):
+        namespace, key = key
+        cache = memory_cache(namespace)
+        if _cas_token is not None and _cas_token != cache.get(key):
+            return 0
+        cache.set(key, value, ttl=ttl)
+        return True
+
+    async def _multi_set(self, pairs, ttl=None, _conn=None):
+        for key, value in pairs:
+            await self._set(key, value, ttl=ttl)
+        return True
+
+    async def _add(self, key, value, ttl=None, _conn=None):
+        namespace, _key = key
+        if _key in memory_cache(namespace):
+            raise ValueError(f"Key {_key} already exists, use .set to update the value")
+        return await self._set(key, value, ttl=ttl)
+
+    async def _exists(self, key, _conn=None):
+        namespace, key = key
+        return key in memory_cache(namespace)
+
+    async def _increment(self, key, delta, _conn=None):
+        namespace, key = key
+        cache = memory_cache(namespace)
+        if (entry := cache._live(key)) is None:
+            cache.set(key, delta)
+            return delta
+        try:
+            entry.value = int(entry.value) + delta
+        except ValueError:
+            raise TypeError("Value is not an integer") from None
+        return entry.value
+
+    async def _expire(self, key, ttl, _conn=None):
+        namespace, key = key
+        return memory_cache(namespace).expire(key, ttl)
+
+    async def _delete(self, key, _conn=None):
+        namespace, key = key
+        return int(memory_cache(namespace).delete(key))
+
+    async def _clear(self, namespace=None, _conn=None):
+        for name, cache in memory_caches.items():
+            if namespace is None or name == namespace:
+                cache.clear()
+        return True
+
+    async def _raw(self, command, *args, encoding="utf-8", _conn=None, **kwargs):
+        raise NotImplementedError(
+            "Raw commands are not supported by the memory backend"
+        )
+
+    async def _redlock_release(self, key, value):
+        namespace, key = key
+        cache = memory_cache(namespace)
+        if (entry := cache._live(key)) is not None and entry.value == value:
+            return int(cache.delete(key))
+        return 0
+
+    @classmethod
+    def parse_uri_path(cls, path):
+        return {}
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import secrets
+from typing import Any
+
+from fastapi import HTTPException
+
+from Models.comic import BaseComicInfo, ComicSearchResult, SourceStatus
+from Models.requests import ComicSearchReq
+from Services.Cache.cache import cache
+from Services.Config.config import config
+from Services.Modulator.dispatcher import search_sources
+
+
+def _query_digest(body: ComicSearchReq) -> str:
+    query = [list(dict.fromkeys(body.sources)), body.keyword, body.extras or {}]
+    return hashlib.sha256(
+        json.dumps(query, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def _comic_keys(src: str, comic: BaseComicInfo) -> list[str]:
+    keys = [f"id:{src}:{comic.id}"]
+    # The same comic listed by two sources shares its title and authors, not its id.
+    # Without authors a shared title is too weak a hint.
+    if authors := sorted(
+        author for author in (a.casefold().strip() for a in comic.author) if author
+    ):
+        title = " ".join(comic.name.casefold().split())
+        keys.append(f"title:{title}:{','.join(authors)}")
+    return keys
+
+
+class SearchCache:
+    """
+    Search Cache
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Merged search result sets kept in the shared cache under an opaque cursor.
+    Sources are asked for their next page, in rounds, only once a client pages
+    past what is already stored. Every round is deduplicated and appended in
+    the order the sources were requested, so an item never moves between pages.
+    A search without `limit` or `cursor` is a single round and is not stored.
+    """
+
+    def __init__(self, ttl: float, max_limit: int, max_rounds: int) -> None:
+        self.ttl = ttl
+        self.max_limit = max_limit
+        self.max_rounds = max_rounds
+        self._locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+    async def _load(self, set_id: str) -> dict[str, Any] | None:
+        return await cache.get(set_id, namespace="search")
+
+    async def _save(self, set_id: str, state: dict[str, Any]) -> None:
+        await cache.set(set_id, state, ttl=self.ttl, namespace="search")
+
+    @staticmethod
+    def _parse_cursor(cursor: str) -> tuple[str, int]:
+        set_id, _, offset = cursor.rpartition(".")
+        if not set_id or not offset.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return set_id, int(offset)
+
+    @staticmethod
+    async def _extend(body: ComicSearchReq, state: dict[str, Any]) -> None:
+        """Fetch the next page of every source that may still have results."""
+        pending = [
+            src for src, source in state["sources"].items() if not source["done"]
+        ]
+        extras = {**(body.extras or {})}
+        if state["round"]:
+            # The first round is a plain search, later ones ask for the next page
+            extras["page"] = state["round"] + 1
+
+        outcomes: dict[str, tuple[SourceStatus, list[BaseComicInfo]]] = {}
+        async for src, status, comics in search_sources(pending, body.keyword, extras):
+            outcomes[src] = status, comics
+
+        seen = set(state["seen"])
+        for src in pending:
+            status, comics = outcomes[src]
+            source = state["sources"][src]
+            added = 0
+            for comic in comics:
+                keys = _comic_keys(src, comic)
+                if seen.isdisjoint(keys):
+                    seen.update(keys)
+                    state["comics"].append(comic.model_dump())
+                    added += 1
+            source["count"] += added
+            source["status"] = status.status
+            source["message"] = status.message
+            # A source ignoring `page` repeats itself, which dedupes to nothing
+            source["done"] = status.status != "ok" or not added
+        state["seen"] = list(seen)
+        state["round"] += 1
+
+    def _new_state(self, body: ComicSearchReq) -> dict[str, Any]:
+        return {
+            "query": _query_digest(body),
+            "round": 0,
+            "comics": [],
+            "seen": [],
+            "sources": {
+                src: {"done": False, "count": 0, "status": "ok", "message": None}
+                for src in dict.fromkeys(body.sources)
+            },
+        }
+
+    async def _fill(
+        self, body: ComicSearchReq, set_id: str, offset: int, limit: int | None
+    ) -> dict[str, Any]:
+        """Load a result set and extend it until it covers the requested page."""
+        if body.cursor is None:
+            state = self._new_state(body)
+        elif (state := await self._load(set_id)) is None:
+            raise HTTPException(status_code=410, detail="Search expired")
+        elif state["query"] != _query_digest(body):
+            raise HTTPException(
+                status_code=400, detail="Cursor belongs to another search"
+            )
+
+        rounds = 0
+        while (
+            rounds < self.max_rounds
+            and len(state["comics"]) < offset + (limit or 1)
+            and any(not source["done"] for source in state["sources"].values())
+        ):
+            await self._extend(body, state)
+            rounds += 1
+        if rounds or body.cursor is None:
+            await self._save(set_id, state)
+        else:
+            await cache.expire(set_id, self.ttl, namespace="search")
+        return state
+
+    @staticmethod
+    def _result(
+        state: dict[str, Any], page: list[dict[str, Any]], next_cursor: str | None
+    ) -> ComicSearchResult:
+        return ComicSearchResult(
+            comics=[BaseComicInfo.model_validate(comic) for comic in page],
+            sources={
+                src: SourceStatus(
+                    status=source["status"],
+                    count=source["count"],
+                    message=source["message"],
+                )
+                for src, source in state["sources"].items()
+            },
+            next_cursor=next_cursor,
+        )
+
+    def check_limit(self, limit: int | None) -> None:
+        if limit is not None and not 1 <= limit <= self.max_limit:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Limit must be between 1 and {self.max_limit}",
+            )
+
+    async def search(self, body: ComicSearchReq) -> ComicSearchResult:
+        limit = body.limit
+        self.check_limit(limit)
+
+        if body.cursor is None and limit is None:
+            # Not paged, nothing to come back for
+            state = self._new_state(body)
+            await self._extend(body, state)
+            return self._result(state, state["comics"], None)
+
+        if body.cursor is None:
+            set_id, offset = secrets.token_urlsafe(16), 0
+        else:
+            set_id, offset = self._parse_cursor(body.cursor)
+
+        # Requests paging the same set wait for each other instead of fetching twice
+        lock, users = self._locks.get(set_id) or (asyncio.Lock(), 0)
+        self._locks[set_id] = lock, users + 1
+        try:
+            async with lock:
+                state = await self._fill(body, set_id, offset, limit)
+        finally:
+            lock, users = self._locks.pop(set_id)
+            if users > 1:
+                self._locks[set_id] = lock, users - 1
+
+        end = len(state["comics"]) if limit is None else offset + limit
+        page = state["comics"][offset:end]
+        next_offset = offset + len(page)
+        more = next_offset < len(state["comics"]) or any(
+            not source["done"] for source in state["sources"].values()
+        )
+        return self._result(state, page, f"{set_id}.{next_offset}" if more else None)
+
+
+search_cache = SearchCache(
+    ttl=config.cache.namespace("search").ttl or 60,
+    max_limit=config.plugin.search_limit,
+    max_rounds=config.plugin.search_rounds,
+)
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from aiocache.base import BaseCache
+
+logger = logging.getLogger("[Cache]")
+
+
+class SQLiteCache(BaseCache):
+    """
+    SQLite Cache
+    ~~~~~~~~~~~~~~~~~~~~~~
+    aiocache backend storing entries in a WAL-mode SQLite database, so every
+    worker process on the same host sees the same data. Reads and
+    single-statement writes run in autocommit so WAL readers never wait on
+    each other, only read-modify-write operations take the write lock up
+    front. Expired rows are ignored on read and removed by a periodic sweep.
+    """
+
+    NAME = "sqlite"
+
+    def __init__(self, path: str, sweep_interval: float = 60, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._sweeper: asyncio.Task[None] | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None, timeout=5
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB, expires_at REAL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    async def _run(
+        self, func: Callable[[sqlite3.Connection], Any], immediate: bool = False
+    ) -> Any:
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep())
+
+        def locked() -> Any:
+            # The connection is shared by this process's threads
+            with self._lock:
+                conn = self._connect()
+                if not immediate:
+                    return func(conn)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    result = func(conn)
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+                return result
+
+        return await asyncio.to_thread(locked)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self._run(
+                    lambda conn: conn.execute(
+                        "DELETE FROM cache WHERE expires_at <= ?", (time.time(),)
+                    ).rowcount
+                )
+                if removed:
+                    logger.debug(f"Swept {removed} expired cache entries")
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to sweep expired cache entries: {e!r}")
+
+    @staticmethod
+    def _expires_at(ttl: float | None) -> float | None:
+        return time.time() + ttl if ttl else None
+
+    @staticmethod
+    def _select(conn: sqlite3.Connection, key: str) -> Any:
+        row = conn.execute(
+            "SELECT value FROM cache WHERE key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _upsert(
+        conn: sqlite3.Connection, key: str, value: Any, expires_at: float | None
+    ) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at),
+        )
+
+    async def _get(self, key, encoding="utf-8", _conn=None):
+        return await self._run(lambda conn: self._select(conn, key))
+
+    async def _gets(self, key, encoding="utf-8", _conn=None):
+        return await self._get(key, encoding=encoding, _conn=_conn)
+
+    async def _multi_get(self, keys, encoding="utf-8", _conn=None):
+        return await self._run(lambda conn: [self._select(conn, key) for key in keys])
+
+    async def _set(self, key, value, ttl=None, _cas_token=None, _conn=None):
+        def set_(conn: sqlite3.Connection) -> bool | int:
+            if _cas_token is not None and _cas_token != self._select(conn, key):
+                return 0
+            self._upsert(conn, key, value, self._expires_at(ttl))
+            return True
+
+        return await self._run(set_, immediate=_cas_token is not None)
+
+    async def _multi_set(self, pairs, ttl=None, _conn=None):
+        def multi_set(conn: sqlite3.Connection) -> bool:
+            for key, value in pairs:
+                self._upsert(conn, key, value, self._expires_at(ttl))
+            return True
+
+        return await self._run(multi_set, immediate=True)
+
+    async def _add(self, key, value, ttl=None, _conn=None):
+        def add(conn: sqlite3.Connection) -> bool:
+            if self._select(conn, key) is not None:
+                raise ValueError(
+                    f"Key {key} already exists, use .set to update the value"
+                )
+            self._upsert(conn, key, value, self._expires_at(ttl))
+            return True
+
+        return await self._run(add, immediate=True)
+
+    async def _exists(self, key, _conn=None):
+        return await self._run(lambda conn: self._select(conn, key) is not None)
+
+    async def _increment(self, key, delta, _conn=None):
+        def increment(conn: sqlite3.Connection) -> int:
+            if (current := self._select(conn, key)) is None:
+                value = delta
+            else:
+                try:
+                    value = int(current) + delta
+                except ValueError:
+                    raise TypeError("Value is not an integer") from None
+            # Keep the remaining ttl of an existing counter
+            conn.execute(
+                "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, NULL) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                "expires_at = CASE WHEN cache.expires_at > ? THEN cache.expires_at END",
+                (key, value, time.time()),
+            )
+            return value
+
+        return await self._run(increment, immediate=True)
+
+    async def _expire(self, key, ttl, _conn=None):
+        def expire(conn: sqlite3.Connection) -> bool:
+            if self._select(conn, key) is None:
+                return False
+            conn.execute(
+                "UPDATE cache SET expires_at = ? WHERE key = ?",
+                (self._expires_at(ttl), key),
+            )
+            return True
+
+        return await self._run(expire, immediate=True)
+
+    async def _delete(self, key, _conn=None):
+        return await self._run(
+            lambda conn: conn.execute(
+                "DELETE FROM cache WHERE key = ?", (key,)
+            ).rowcount
+        )
+
+    async def _clear(self, namespace=None, _conn=None):
+        def clear(conn: sqlite3.Connection) -> bool:
+            if namespace:
+                conn.execute(
+                    "DELETE FROM cache WHERE substr(key, 1, ?) = ?",
+                    (len(namespace), namespace),
+                )
+            else:
+                conn.execute("DELETE FROM cache")
+            return True
+
+        return await self._run(clear)
+
+    async def _raw(self, command, *args, encoding="utf-8", _conn=None, **kwargs):
+        return await self._run(lambda conn: conn.execute(command, args).fetchall())
+
+    async def _redlock_release(self, key, value):
+        return await self._run(
+            lambda conn: conn.execute(
+                "DELETE FROM cache WHERE key = ? AND value = ?", (key, value)
+            ).rowcount
+        )
+
+    async def _close(self, *args, _conn=None, **kwargs):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @classmethod
+    def parse_uri_path(cls, path):
+        return {"path": path}
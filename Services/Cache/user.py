@@ -0,0 +1,5 @@
+from Models.user import User
+from Services.Cache.memory import MemoryCache, memory_cache
+
+# Authenticated users keyed by user id, entries must be deleted whenever a user changes
+user_cache: MemoryCache[User] = memory_cache("user")
@@ -1,13 +1,18 @@
 import json
 import os
 from pathlib import Path
+from typing import Literal
 
 import toml
-from pydantic import BaseModel
+from limits.storage import SCHEMES, MovingWindowSupport, SlidingWindowCounterSupport
+from pydantic import BaseModel, model_validator
 
 
 class SecurityConfig(BaseModel):
     secret_key: str
+    bcrypt_rounds: int = 12
+    hash_workers: int | None = None
+    hash_queue: int = 64
 
 
 class DatabaseConfig(BaseModel):
@@ -16,6 +21,12 @@ class DatabaseConfig(BaseModel):
     name: str
     username: str
     password: str
+    url: str | None = None
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
 
 
 class EmailConfig(BaseModel):
@@ -23,10 +34,149 @@ class EmailConfig(BaseModel):
     port: int
     address: str
     password: str
+    use_ssl: bool = True
+    timeout: float = 10.0
+    workers: int = 2
+    queue_size: int = 1000
+    max_retries: int = 5
+    retry_backoff: float = 2.0
+
+
+class PluginPolicy(BaseModel):
+    call_timeout: float = 30.0
+    queue_timeout: float = 10.0
+    max_concurrency: int = 8
+    failure_threshold: int = 5
+    recovery_time: float = 30.0
 
 
 class PluginConfig(BaseModel):
     strict_load: bool
+    load_mode: Literal["sequential", "parallel", "lazy"] = "sequential"
+    max_workers: int = 4
+    isolation: Literal["thread", "process"] = "thread"
+    processes: int = 1
+    search_timeout: float = 10.0
+    batch_limit: int = 100
+    search_limit: int = 100
+    search_rounds: int = 3
+    batch_concurrency: int = 4
+    source_timeouts: dict[str, float] = {}
+    admin_token: str | None = None
+    drain_timeout: float = 30.0
+    watch: bool = False
+    watch_interval: float = 2.0
+    policy: PluginPolicy = PluginPolicy()
+    coalesce: list[str] = ["search", "album", "chapter_images"]
+    policies: dict[str, PluginPolicy] = {}
+
+    def get_timeout(self, source: str) -> float:
+        return self.source_timeouts.get(source, self.search_timeout)
+
+    def get_policy(self, plugin: str) -> PluginPolicy:
+        return self.policies.get(plugin, self.policy)
+
+
+class NamespaceConfig(BaseModel):
+    ttl: float | None = None
+    max_entries: int = 1024
+    policy: Literal["lru", "lfu"] = "lru"
+
+
+DEFAULT_NAMESPACES = {
+    "captcha": NamespaceConfig(ttl=300, max_entries=10000),
+    "album": NamespaceConfig(ttl=600, max_entries=1024),
+    "user": NamespaceConfig(ttl=60, max_entries=10000),
+    "search": NamespaceConfig(ttl=60, max_entries=1024, policy="lfu"),
+}
+
+
+class CacheConfig(BaseModel):
+    backend: Literal["memory", "sqlite", "redis"] = "memory"
+    sqlite_path: str = "Cache/cache.db"
+    sweep_interval: float = 60
+    redis_url: str = "redis://127.0.0.1:6379/0"
+    album_stale_ttl: float = 3600
+    namespaces: dict[str, NamespaceConfig] = {}
+
+    def namespace(self, name: str) -> NamespaceConfig:
+        """In-process cache settings of a namespace, album namespaces are per source."""
+        name = name.split(":", 1)[0]
+        return (
+            self.namespaces.get(name)
+            or DEFAULT_NAMESPACES.get(name)
+            or NamespaceConfig()
+        )
+
+
+class ImageConfig(BaseModel):
+    cache_dir: str = "Cache/Images"
+    chunk_size: int = 64 * 1024
+    chapter_ttl: int = 3600
+    timeout: float = 30.0
+    shaper_workers: int | None = None
+    shaper_prefetch: int = 8
+
+
+class HttpClientConfig(BaseModel):
+    http2: bool = True
+    timeout: float = 15.0
+    max_connections: int = 100
+    max_keepalive: int = 20
+    keepalive_expiry: float = 30.0
+    max_per_host: int = 10
+    proxy: str | None = None
+
+
+class HttpConfig(HttpClientConfig):
+    dns_ttl: float = 300.0
+    sources: dict[str, HttpClientConfig] = {}
+
+    def settings(self, source: str | None = None) -> HttpClientConfig:
+        """Client settings of a source, its overrides applied on top of the defaults."""
+        base = HttpClientConfig.model_validate(
+            self.model_dump(include=set(HttpClientConfig.model_fields))
+        )
+        if source is None or (override := self.sources.get(source)) is None:
+            return base
+        return base.model_copy(update=override.model_dump(exclude_unset=True))
+
+
+class IndexConfig(BaseModel):
+    enabled: bool = True
+    path: str = "Cache/Index"
+    flush_interval: float = 30.0
+    flush_docs: int = 5000
+    max_segments: int = 8
+    suggest_limit: int = 10
+    local_min_hits: int = 10
+
+
+class LimiterConfig(BaseModel):
+    storage_uri: str = "memory://"
+    strategy: Literal["fixed-window", "moving-window", "sliding-window-counter"] = (
+        "moving-window"
+    )
+    default_limits: list[str] = ["100/minute"]
+    trusted_proxies: list[str] = []
+    routes: dict[str, str] = {}
+    max_upload_size: int = 25 * 1024 * 1024
+    upload_limits: dict[str, int] = {}
+
+    @model_validator(mode="after")
+    def check_strategy(self):
+        scheme = self.storage_uri.split("://", 1)[0]
+        if (storage := SCHEMES.get(scheme)) is None:
+            raise ValueError(f"Unsupported limiter storage: {self.storage_uri}")
+        support = {
+            "moving-window": MovingWindowSupport,
+            "sliding-window-counter": SlidingWindowCounterSupport,
+        }.get(self.strategy)
+        if support is not None and not issubclass(storage, support):
+            raise ValueError(
+                f"Limiter storage {scheme}:// doesn't support the {self.strategy} strategy"
+            )
+        return self
 
 
 class LogConfig(BaseModel):
@@ -38,6 +188,11 @@ class Config(BaseModel):
     database: DatabaseConfig
     email: EmailConfig
     plugin: PluginConfig
+    cache: CacheConfig = CacheConfig()
+    image: ImageConfig = ImageConfig()
+    http: HttpConfig = HttpConfig()
+    index: IndexConfig = IndexConfig()
+    limiter: LimiterConfig = LimiterConfig()
     log: LogConfig = LogConfig(log_level="INFO")
 
     @classmethod
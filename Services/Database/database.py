@@ -1,20 +1,84 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import time
+from typing import Any, AsyncIterator
+
+from sqlalchemy import URL, QueuePool, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
 from Services.Config.config import config
+from Services.Metrics.metrics import metrics
 
-engine = create_engine(
-    f"mysql://{config.database.username}:{config.database.password}@{config.database.host}:{config.database.port}/{config.database.name}",
-    connect_args={"connect_timeout": 10},
+url = (
+    make_url(config.database.url)
+    if config.database.url
+    else URL.create(
+        "mysql+aiomysql",
+        username=config.database.username,
+        password=config.database.password,
+        host=config.database.host,
+        port=config.database.port,
+        database=config.database.name,
+    )
 )
 
-SessionLocal = sessionmaker(autocommit=False, bind=engine, expire_on_commit=True)
+if url.get_backend_name() == "sqlite":
+    # SQLite stand-in, pooling options don't apply
+    engine = create_async_engine(url)
+else:
+    engine = create_async_engine(
+        url,
+        pool_size=config.database.pool_size,
+        max_overflow=config.database.max_overflow,
+        pool_timeout=config.database.pool_timeout,
+        pool_recycle=config.database.pool_recycle,
+        pool_pre_ping=config.database.pool_pre_ping,
+        connect_args={"connect_timeout": 10},
+    )
+
+SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
 Base = declarative_base()
 
 
-def get_db():
-    database = SessionLocal()
-    try:
+class PoolStats:
+    checkouts: int
+    total_wait: float
+    max_wait: float
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict[str, Any]:
+        pool = engine.pool
+        result: dict[str, Any] = {
+            "checkouts": self.checkouts,
+            "avg_wait": self.total_wait / self.checkouts if self.checkouts else 0.0,
+            "max_wait": self.max_wait,
+        }
+        if isinstance(pool, QueuePool):
+            result.update(
+                size=pool.size(),
+                in_use=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=pool.overflow(),
+            )
+        return result
+
+
+pool_stats = PoolStats()
+metrics.register("database", pool_stats.snapshot)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with SessionLocal() as database:
+        # Check the connection out up front so waiting on a saturated pool is measured
+        started = time.perf_counter()
+        await database.connection()
+        pool_stats.record_wait(time.perf_counter() - started)
         yield database
-    finally:
-        database.close()
@@ -0,0 +1,295 @@
+import asyncio
+import importlib.util
+import logging
+import socket
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Iterable
+
+import httpcore
+import httpx
+
+from Services.Config.config import HttpClientConfig, config
+from Services.Metrics.metrics import metrics
+
+logger = logging.getLogger("[Http]")
+
+
+class HostStats:
+    requests: int
+    connections: int
+    in_flight: int
+    total_latency: float
+    max_latency: float
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency: float) -> None:
+        self.requests += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self) -> dict[str, int | float]:
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "reuse_rate": (
+                1 - self.connections / self.requests if self.requests else 0.0
+            ),
+            "in_flight": self.in_flight,
+            "avg_latency": self.total_latency / self.requests if self.requests else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+class CachingResolver(httpcore.AsyncNetworkBackend):
+    """Network backend resolving host names once per `ttl` instead of per connection."""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._backend = httpcore.AnyIOBackend()
+        self._cache: dict[tuple[str, int], tuple[float, list[str]]] = {}
+
+    async def _resolve(self, host: str, port: int) -> list[str]:
+        if (cached := self._cache.get((host, port))) is not None:
+            if cached[0] > time.monotonic():
+                return cached[1]
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+        addresses = list(dict.fromkeys(str(info[4][0]) for info in infos))
+        self._cache[(host, port)] = (time.monotonic() + self.ttl, addresses)
+        return addresses
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: float | None = None,
+        local_address: str | None = None,
+        socket_options: Iterable[Any] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        # TLS still verifies and sends SNI for the original host name
+        error: Exception | None = None
+        for address in await self._resolve(host, port):
+            try:
+                return await self._backend.connect_tcp(
+                    address, port, timeout, local_address, socket_options
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        self._cache.pop((host, port), None)
+        raise error or httpcore.ConnectError(f"Failed to resolve {host}")
+
+    async def connect_unix_socket(
+        self,
+        path: str,
+        timeout: float | None = None,
+        socket_options: Iterable[Any] | None = None,
+    ) -> httpcore.AsyncNetworkStream:
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+# httpcore errors as httpx raises them, the most specific class wins
+HTTPCORE_ERRORS: dict[type[Exception], type[httpx.TransportError]] = {
+    httpcore.TimeoutException: httpx.TimeoutException,
+    httpcore.ConnectTimeout: httpx.ConnectTimeout,
+    httpcore.ReadTimeout: httpx.ReadTimeout,
+    httpcore.WriteTimeout: httpx.WriteTimeout,
+    httpcore.PoolTimeout: httpx.PoolTimeout,
+    httpcore.NetworkError: httpx.NetworkError,
+    httpcore.ConnectError: httpx.ConnectError,
+    httpcore.ReadError: httpx.ReadError,
+    httpcore.WriteError: httpx.WriteError,
+    httpcore.ProxyError: httpx.ProxyError,
+    httpcore.UnsupportedProtocol: httpx.UnsupportedProtocol,
+    httpcore.ProtocolError: httpx.ProtocolError,
+    httpcore.LocalProtocolError: httpx.LocalProtocolError,
+    httpcore.RemoteProtocolError: httpx.RemoteProtocolError,
+}
+
+
+def _map_error(e: Exception) -> Exception:
+    for cls in type(e).__mro__:
+        if (mapped := HTTPCORE_ERRORS.get(cls)) is not None:
+            return mapped(str(e))
+    return e
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: AsyncIterable[bytes], release: Any) -> None:
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except Exception as e:
+            if (mapped := _map_error(e)) is e:
+                raise
+            raise mapped from e
+
+    async def aclose(self) -> None:
+        try:
+            if hasattr(self._stream, "aclose"):
+                await self._stream.aclose()  # type: ignore
+        finally:
+            self._release()
+
+
+class PooledTransport(httpx.AsyncBaseTransport):
+    """
+    Pooled Transport
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Keep-alive transport over an `httpcore` connection pool connecting
+    through the caching resolver, capping the requests in flight to each host
+    at `max_per_host`. A slot is held until the response body is closed, and
+    waiting for one counts against the request's pool timeout. Per-host
+    latency and new connections are recorded along the way.
+    """
+
+    def __init__(
+        self,
+        settings: HttpClientConfig,
+        resolver: CachingResolver,
+        stats: dict[str, HostStats],
+    ) -> None:
+        self.max_per_host = settings.max_per_host
+        self.stats = stats
+        self._slots: dict[str, asyncio.Semaphore] = {}
+        proxy = None
+        if settings.proxy is not None:
+            # httpx parses the credentials out of the proxy URL
+            parsed = httpx.Proxy(settings.proxy)
+            proxy = httpcore.Proxy(
+                url=str(parsed.url), auth=parsed.raw_auth, headers=parsed.headers.raw
+            )
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            proxy=proxy,
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive,
+            keepalive_expiry=settings.keepalive_expiry,
+            http1=True,
+            http2=settings.http2,
+            network_backend=resolver,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        stats = self.stats.setdefault(host, HostStats())
+        slots = self._slots.setdefault(host, asyncio.Semaphore(self.max_per_host))
+
+        upstream_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: dict[str, Any]) -> None:
+            if event == "connection.connect_tcp.complete":
+                stats.connections += 1
+            if upstream_trace is not None:
+                await upstream_trace(event, info)
+
+        request.extensions["trace"] = trace
+        timeout = request.extensions.get("timeout", {}).get("pool")
+        try:
+            async with asyncio.timeout(timeout):
+                await slots.acquire()
+        except TimeoutError:
+            raise httpx.PoolTimeout(
+                f"Timed out waiting for a request slot to {host}", request=request
+            )
+        stats.in_flight += 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                stats.in_flight -= 1
+                slots.release()
+
+        assert isinstance(request.stream, httpx.AsyncByteStream)
+        upstream = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        started = time.perf_counter()
+        try:
+            response = await self._pool.handle_async_request(upstream)
+        except Exception as e:
+            release()
+            if (mapped := _map_error(e)) is e:
+                raise
+            raise mapped from e
+        except BaseException:
+            release()
+            raise
+        stats.record(time.perf_counter() - started)
+        assert isinstance(response.stream, AsyncIterable)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._pool.aclose()
+
+
+class HttpClients:
+    """
+    HTTP Clients
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Pooled `httpx.AsyncClient`s shared by plugins and the image proxy. Sources
+    without their own settings under `[http.sources]` share the default client,
+    so connections to a host are reused across everything that talks to it.
+    """
+
+    def __init__(self) -> None:
+        self.stats: dict[str, HostStats] = {}
+        self.resolver = CachingResolver(config.http.dns_ttl)
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def _create(self, settings: HttpClientConfig) -> httpx.AsyncClient:
+        if settings.http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 needs the h2 package, falling back to HTTP/1.1")
+            settings = settings.model_copy(update={"http2": False})
+        return httpx.AsyncClient(
+            transport=PooledTransport(settings, self.resolver, self.stats),
+            timeout=settings.timeout,
+            follow_redirects=True,
+        )
+
+    def get(self, source: str | None = None) -> httpx.AsyncClient:
+        key = source if source in config.http.sources else ""
+        if (client := self._clients.get(key)) is None or client.is_closed:
+            client = self._clients[key] = self._create(config.http.settings(source))
+        return client
+
+    async def close(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {host: stats.snapshot() for host, stats in self.stats.items()}
+
+
+http_clients = HttpClients()
+metrics.register("http", http_clients.snapshot)
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import AsyncIterator
+from uuid import uuid4
+
+import httpx
+from fastapi import HTTPException
+
+from Models.comic import ComicImage
+from Services.Config.config import config
+from Services.Http.http import http_clients
+
+logger = logging.getLogger("[Image]")
+
+
+class CachedImage:
+    path: Path
+    media_type: str
+    digest: str
+
+    def __init__(self, path: Path, media_type: str, digest: str) -> None:
+        self.path = path
+        self.media_type = media_type
+        self.digest = digest
+
+
+class ImageStore:
+    """
+    Image Store
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Content-addressed on-disk cache for chapter pages. Page bytes are stored
+    once under their SHA-256 digest in `blobs/`, and every page key points at
+    its blob through a small reference file in `refs/`. File access runs in
+    threads, and requests for a page that is already being fetched wait for
+    that fetch instead of starting their own.
+    """
+
+    def __init__(self, root: str, chunk_size: int, timeout: float) -> None:
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._fetching: dict[str, asyncio.Future[CachedImage | None]] = {}
+        for directory in ("blobs", "refs", "tmp"):
+            self.root.joinpath(directory).mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def page_key(src_id: str, album_id: str, chapter_id: str, page: int) -> str:
+        return hashlib.sha256(
+            f"{src_id}/{album_id}/{chapter_id}/{page}".encode("utf-8")
+        ).hexdigest()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root.joinpath("blobs", digest[:2], digest)
+
+    def _ref_path(self, key: str) -> Path:
+        return self.root.joinpath("refs", key[:2], key)
+
+    def _lookup(self, key: str) -> CachedImage | None:
+        try:
+            with open(self._ref_path(key), "r", encoding="utf-8") as f:
+                ref = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if not (path := self._blob_path(ref["digest"])).exists():
+            return None
+        return CachedImage(path, ref["media_type"], ref["digest"])
+
+    async def lookup(self, key: str) -> CachedImage | None:
+        return await asyncio.to_thread(self._lookup, key)
+
+    async def stored(self, keys: list[str]) -> set[str]:
+        """The keys among `keys` that are already in the store."""
+        return await asyncio.to_thread(
+            lambda: {key for key in keys if self._lookup(key) is not None}
+        )
+
+    async def join(self, key: str) -> CachedImage | None:
+        """Wait for a fetch of `key` already in progress, None if there is none or it failed."""
+        while (future := self._fetching.get(key)) is not None:
+            try:
+                # A stalled fetch doesn't hold its waiters forever
+                async with asyncio.timeout(self.timeout):
+                    cached = await asyncio.shield(future)
+            except TimeoutError:
+                return None
+            if cached is not None:
+                return cached
+        return None
+
+    def _settle(self, key: str, cached: CachedImage | None) -> None:
+        if (future := self._fetching.pop(key, None)) is not None and not future.done():
+            future.set_result(cached)
+
+    def store(
+        self, key: str, tmp_path: Path, digest: str, media_type: str
+    ) -> CachedImage:
+        """Move a fully written temporary file into the store and point `key` at it."""
+        blob_path = self._blob_path(digest)
+        blob_path.parent.mkdir(exist_ok=True)
+        if blob_path.exists():
+            tmp_path.unlink(missing_ok=True)
+        else:
+            os.replace(tmp_path, blob_path)
+
+        ref_path = self._ref_path(key)
+        ref_path.parent.mkdir(exist_ok=True)
+        ref_tmp = self.root.joinpath("tmp", f"{uuid4().hex}.ref")
+        with open(ref_tmp, "w", encoding="utf-8") as f:
+            json.dump({"digest": digest, "media_type": media_type}, f)
+        os.replace(ref_tmp, ref_path)
+        return CachedImage(blob_path, media_type, digest)
+
+    async def open(
+        self, key: str, image: ComicImage, src_id: str
+    ) -> tuple[str, AsyncIterator[bytes]]:
+        """
+        Start fetching a page from its source. Returns the upstream media type
+        and an iterator over the body, which is written to the store as it is
+        consumed and only committed once the whole page has been received.
+        Other requests for `key` can `join` the fetch meanwhile.
+        """
+        self._fetching[key] = asyncio.get_running_loop().create_future()
+        client = http_clients.get(src_id)
+        request = client.build_request(
+            "GET", image.url, headers=image.headers, timeout=self.timeout
+        )
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            self._settle(key, None)
+            logger.warning(f"Failed to fetch image {image.url}: {e!r}")
+            raise HTTPException(status_code=502, detail="Failed to fetch image")
+        except BaseException:
+            self._settle(key, None)
+            raise
+
+        if response.status_code != 200:
+            self._settle(key, None)
+            await response.aclose()
+            logger.warning(
+                f"Failed to fetch image {image.url}: upstream returned {response.status_code}"
+            )
+            raise HTTPException(status_code=502, detail="Failed to fetch image")
+
+        media_type = response.headers.get("content-type", "application/octet-stream")
+        return media_type, self._tee(key, media_type, response)
+
+    async def fetch(self, image: ComicImage, src_id: str) -> tuple[str, bytes]:
+        """Fetch a whole page from its source, for pages that must be processed first."""
+        try:
+            response = await http_clients.get(src_id).get(
+                image.url, headers=image.headers, timeout=self.timeout
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to fetch image {image.url}: {e!r}")
+            raise HTTPException(status_code=502, detail="Failed to fetch image")
+
+        if response.status_code != 200:
+            logger.warning(
+                f"Failed to fetch image {image.url}: upstream returned {response.status_code}"
+            )
+            raise HTTPException(status_code=502, detail="Failed to fetch image")
+
+        media_type = response.headers.get("content-type", "application/octet-stream")
+        return media_type, response.content
+
+    def put(self, key: str, data: bytes, media_type: str) -> CachedImage:
+        tmp_path = self.root.joinpath("tmp", uuid4().hex)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        return self.store(key, tmp_path, hashlib.sha256(data).hexdigest(), media_type)
+
+    async def _tee(
+        self, key: str, media_type: str, response: httpx.Response
+    ) -> AsyncIterator[bytes]:
+        tmp_path = self.root.joinpath("tmp", uuid4().hex)
+        hasher = hashlib.sha256()
+        cached: CachedImage | None = None
+        try:
+            f = await asyncio.to_thread(open, tmp_path, "wb")
+            try:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    await asyncio.to_thread(f.write, chunk)
+                    hasher.update(chunk)
+                    yield chunk
+            finally:
+                await asyncio.to_thread(f.close)
+            cached = await asyncio.to_thread(
+                self.store, key, tmp_path, hasher.hexdigest(), media_type
+            )
+        finally:
+            self._settle(key, cached)
+            await response.aclose()
+            if cached is None:
+                await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+
+
+image_store = ImageStore(
+    root=config.image.cache_dir,
+    chunk_size=config.image.chunk_size,
+    timeout=config.image.timeout,
+)
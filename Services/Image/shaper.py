@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from Models.comic import ComicImage
+from Models.plugins import Plugin
+from Services.Config.config import config
+from Services.Image.image import CachedImage, ImageStore, image_store
+
+logger = logging.getLogger("[Image]")
+
+
+class ImageShaper:
+    """
+    Image Shaper
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Descrambles chapter pages with the plugin's `IShaper.imager_shaper` in a
+    bounded process pool, or in the plugin's own workers when it runs out of
+    process. A request for a page also schedules the uncached pages in a
+    window around it, `prefetch` pages ahead and the one before, in batches
+    of `max_workers`, and each result is stored so a page is only shaped once.
+    Pool processes keep the plugin modules they imported, so the pool is
+    replaced once a plugin that used it is reloaded or unloaded.
+    """
+
+    def __init__(self, store: ImageStore, max_workers: int, prefetch: int) -> None:
+        self.store = store
+        self.max_workers = max_workers
+        self.prefetch = prefetch
+        self._pool: ProcessPoolExecutor | None = None
+        self._users: set[str] = set()
+        self._pending: dict[str, asyncio.Future[CachedImage | None]] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def retire(self, plugin: Plugin) -> None:
+        """Stop using pool processes that imported an outgoing version of `plugin`."""
+        if plugin.name not in self._users or self._pool is None:
+            return
+        # Pages already submitted still finish in the old processes
+        self._pool.shutdown(wait=False)
+        self._pool = None
+        self._users.clear()
+
+    async def _shape_page(
+        self, plugin: Plugin, src_id: str, key: str, image: ComicImage
+    ) -> CachedImage:
+        media_type, data = await self.store.fetch(image, src_id)
+        if plugin.workers is not None:
+            shaped = await plugin.call("imager_shaper", data, **(image.shaper or {}))
+        else:
+            self._users.add(plugin.name)
+            shaped = await asyncio.get_running_loop().run_in_executor(
+                self.pool,
+                partial(
+                    type(plugin.instance).imager_shaper,  # type: ignore
+                    data,
+                    **(image.shaper or {}),
+                ),
+            )
+        return await asyncio.to_thread(self.store.put, key, shaped, media_type)
+
+    async def _run(
+        self, plugin: Plugin, src_id: str, jobs: list[tuple[str, ComicImage]]
+    ) -> None:
+        for start in range(0, len(jobs), self.max_workers):
+            batch = jobs[start : start + self.max_workers]
+            results = await asyncio.gather(
+                *(self._shape_page(plugin, src_id, key, image) for key, image in batch),
+                return_exceptions=True,
+            )
+            for (key, image), result in zip(batch, results):
+                future = self._pending.pop(key)
+                if isinstance(result, BaseException):
+                    logger.warning(f"Failed to shape image {image.url}: {result!r}")
+                    future.set_result(None)
+                else:
+                    future.set_result(result)
+
+    async def shape(
+        self,
+        plugin: Plugin,
+        src_id: str,
+        album_id: str,
+        chapter_id: str,
+        page: int,
+        images: list[ComicImage],
+    ) -> CachedImage | None:
+        """Return the shaped page, scheduling the pages around it alongside it."""
+        loop = asyncio.get_running_loop()
+        window = [
+            *range(page, min(page + self.prefetch + 1, len(images))),
+            *range(max(page - 1, 0), page),
+        ]
+        candidates = [
+            (self.store.page_key(src_id, album_id, chapter_id, index), images[index])
+            for index in window
+            if images[index].shaper is not None
+        ]
+        stored = await self.store.stored([key for key, _ in candidates])
+        jobs: list[tuple[str, ComicImage]] = []
+        for key, image in candidates:
+            if key in self._pending or key in stored:
+                continue
+            self._pending[key] = loop.create_future()
+            jobs.append((key, image))
+
+        if jobs:
+            task = asyncio.create_task(self._run(plugin, src_id, jobs))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        key = self.store.page_key(src_id, album_id, chapter_id, page)
+        if (future := self._pending.get(key)) is not None:
+            return await asyncio.shield(future)
+        return await self.store.lookup(key)
+
+    def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+image_shaper = ImageShaper(
+    store=image_store,
+    max_workers=config.image.shaper_workers or os.cpu_count() or 1,
+    prefetch=config.image.shaper_prefetch,
+)
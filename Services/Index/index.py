@@ -0,0 +1,395 @@
+import asyncio
+import itertools
+import logging
+import time
+from pathlib import Path
+from typing import IO, Any, Iterable
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from Models.comic import BaseComicInfo
+from Services.Config.config import config
+from Services.Index.segment import (
+    DiskSegment,
+    MemorySegment,
+    document_terms,
+    tokenize,
+    write_segment,
+)
+from Services.Metrics.metrics import metrics
+
+logger = logging.getLogger("[Index]")
+
+Segment = MemorySegment | DiskSegment
+
+FUZZY_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+# Weight of a query token by how it matched a term
+EXACT, PREFIX, FUZZY = 1.0, 0.75, 0.5
+
+
+def _edits(word: str) -> set[str]:
+    """Words one deletion, transposition, replacement or insertion away."""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    return {
+        *(left + right[1:] for left, right in splits if right),
+        *(
+            left + right[1] + right[0] + right[2:]
+            for left, right in splits
+            if len(right) > 1
+        ),
+        *(
+            left + char + right[1:]
+            for left, right in splits
+            if right
+            for char in FUZZY_ALPHABET
+        ),
+        *(left + char + right for left, right in splits for char in FUZZY_ALPHABET),
+    } - {word}
+
+
+def _key(src: str, comic_id: str) -> str:
+    return f"{src}\0{comic_id}"
+
+
+def _try_lock(f: IO[bytes]) -> bool:
+    """Take an exclusive lock on `f` without waiting, held until it is closed."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+class ComicIndex:
+    """
+    Comic Index
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Local full-text index over every comic plugins have returned. New comics
+    go to an in-memory segment that is periodically flushed to an immutable,
+    memory-mapped segment file, segments are merged once there are more than
+    `max_segments`. A comic seen again replaces its older version.
+
+    Every worker process sharing the directory claims a numbered slot through
+    a lock file and only ever writes, merges and deletes the segments named
+    after its slot. The segments of other slots are searched read-only.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        enabled: bool,
+        flush_interval: float,
+        flush_docs: int,
+        max_segments: int,
+    ) -> None:
+        self.root = Path(root)
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.flush_docs = flush_docs
+        self.max_segments = max_segments
+        self.segments: list[DiskSegment] = []
+        self.memory = MemorySegment()
+        # Memory segments being written to disk, still searched meanwhile
+        self.flushing: list[MemorySegment] = []
+        self.queries = 0
+        self.query_time = 0.0
+        self._latest: dict[str, tuple[Segment, int]] = {}
+        self._sequence = 0
+        self._slot: int | None = None
+        self._slot_lock: IO[bytes] | None = None
+        self._flusher: asyncio.Task[None] | None = None
+        self._flushing: asyncio.Task[None] | None = None
+
+    def _searchable(self) -> list[Segment]:
+        return [*self.segments, *self.flushing, self.memory]
+
+    def _register(self, segment: Segment) -> None:
+        for local, key in enumerate(segment.keys):
+            self._latest[key] = (segment, local)
+
+    def _claim_slot(self) -> None:
+        for slot in itertools.count():
+            f = open(self.root.joinpath(f"{slot:02d}.lock"), "a+b")
+            if _try_lock(f):
+                self._slot, self._slot_lock = slot, f
+                return
+            f.close()
+
+    def _owns(self, path: Path) -> bool:
+        return path.name.startswith(f"{self._slot:02d}-")
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(self._claim_slot)
+        # Left behind by the slot's previous owner, other slots may still be writing
+        for tmp in self.root.glob(f"{self._slot:02d}-*.tmp"):
+            tmp.unlink()
+        for path in sorted(self.root.glob("*.seg")):
+            try:
+                segment = await asyncio.to_thread(DiskSegment, path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping broken index segment {path.name}: {e!r}")
+                continue
+            self.segments.append(segment)
+            self._register(segment)
+            if self._owns(path):
+                self._sequence = max(self._sequence, int(path.stem.rsplit("-", 1)[1]))
+        logger.info(
+            f"Index slot {self._slot} loaded with {len(self._latest)} comics "
+            f"in {len(self.segments)} segments"
+        )
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def document(self, src: str, comic_id: str) -> dict[str, Any] | None:
+        if (ref := self._latest.get(_key(src, comic_id))) is None:
+            return None
+        segment, local = ref
+        return segment.doc(local)
+
+    def _put(self, src: str, doc: dict[str, Any]) -> None:
+        key = _key(src, doc["id"])
+        self._latest[key] = (self.memory, self.memory.add(key, doc))
+        if len(self.memory) >= self.flush_docs and self._flushing is None:
+            self._flushing = asyncio.create_task(self.flush())
+
+    def add(self, src: str, comics: Iterable[BaseComicInfo]) -> None:
+        if not self.enabled:
+            return
+        for comic in comics:
+            current = self.document(src, comic.id)
+            doc = {
+                "source": src,
+                "id": comic.id,
+                "name": comic.name,
+                "author": comic.author,
+                "cover": comic.cover,
+                "tags": current["tags"] if current is not None else [],
+            }
+            if doc != current:
+                self._put(src, doc)
+
+    def add_tags(self, src: str, comic_id: str, tags: list[str] | None) -> None:
+        """Enrich an indexed comic with the tags of its album."""
+        if not self.enabled or not tags:
+            return
+        if (current := self.document(src, comic_id)) is not None and current[
+            "tags"
+        ] != tags:
+            self._put(src, {**current, "tags": tags})
+
+    def _match(self, token: str, prefix: bool) -> dict[tuple[int, int], float]:
+        """Live documents matching a query token, with the weight of their best match."""
+        hits: dict[tuple[int, int], float] = {}
+        segments = self._searchable()
+
+        def collect(
+            weight: float, matches: Iterable[tuple[int, Iterable[int]]]
+        ) -> None:
+            for number, postings in matches:
+                for local in postings:
+                    if hits.get((number, local), 0.0) < weight:
+                        hits[(number, local)] = weight
+
+        collect(EXACT, ((n, s.lookup(token)) for n, s in enumerate(segments)))
+        if prefix:
+            collect(
+                PREFIX,
+                (
+                    (n, postings)
+                    for n, s in enumerate(segments)
+                    for term, postings in s.prefixed(token)
+                    if term != token
+                ),
+            )
+        if not hits and len(token) >= 4 and token.isascii():
+            collect(
+                FUZZY,
+                (
+                    (n, s.lookup(term))
+                    for term in _edits(token)
+                    for n, s in enumerate(segments)
+                ),
+            )
+        return hits
+
+    def search(
+        self,
+        query: str,
+        sources: Iterable[str] | None = None,
+        limit: int = 10,
+        prefix: bool = True,
+    ) -> list[tuple[str, BaseComicInfo]]:
+        """
+        Comics matching every token of `query`, best matches first. The last
+        token also matches as a prefix, and tokens matching nothing fall back
+        to terms one edit away.
+        """
+        if not self.enabled or not (tokens := list(dict.fromkeys(tokenize(query)))):
+            return []
+        started = time.perf_counter()
+        allowed = set(sources) if sources is not None else None
+        segments = self._searchable()
+
+        scores: dict[tuple[int, int], float] | None = None
+        for position, token in enumerate(tokens):
+            hits = self._match(token, prefix and position == len(tokens) - 1)
+            if scores is None:
+                scores = hits
+            else:
+                scores = {
+                    hit: score + hits[hit]
+                    for hit, score in scores.items()
+                    if hit in hits
+                }
+            if not scores:
+                break
+
+        results: list[tuple[str, BaseComicInfo]] = []
+        # Newer segments and documents first among equal scores
+        for number, local in sorted(scores or {}, key=lambda hit: (-scores[hit], -hit[0], -hit[1])):  # type: ignore
+            segment = segments[number]
+            key = segment.keys[local]
+            if self._latest.get(key) != (segment, local):
+                continue
+            src = key.split("\0", 1)[0]
+            if allowed is not None and src not in allowed:
+                continue
+            doc = segment.doc(local)
+            results.append(
+                (
+                    src,
+                    BaseComicInfo(
+                        id=doc["id"],
+                        name=doc["name"],
+                        author=doc["author"],
+                        cover=doc["cover"],
+                    ),
+                )
+            )
+            if len(results) >= limit:
+                break
+
+        self.queries += 1
+        self.query_time += time.perf_counter() - started
+        return results
+
+    def _live(self, segment: Segment) -> list[int]:
+        return [
+            local
+            for local, key in enumerate(segment.keys)
+            if self._latest.get(key) == (segment, local)
+        ]
+
+    async def _merge(self, merging: list[Segment]) -> DiskSegment | None:
+        """Write the live documents of `merging` to a new segment file."""
+        # Versions already replaced by newer ones are left behind
+        parts = [(segment, self._live(segment)) for segment in merging]
+        if not any(live for _, live in parts):
+            return None
+        self._sequence += 1
+        path = self.root.joinpath(f"{self._slot:02d}-{self._sequence:08d}.seg")
+        await asyncio.to_thread(self._write, path, parts)
+        segment = await asyncio.to_thread(DiskSegment, path)
+        self._swap(merging, segment)
+        return segment
+
+    @staticmethod
+    def _write(path: Path, parts: list[tuple[Segment, list[int]]]) -> None:
+        keys: list[str] = []
+        docs: list[dict[str, Any]] = []
+        postings: dict[str, list[int]] = {}
+        for segment, live in parts:
+            for local in live:
+                doc = segment.doc(local)
+                for term in document_terms(doc):
+                    postings.setdefault(term, []).append(len(docs))
+                keys.append(segment.keys[local])
+                docs.append(doc)
+        write_segment(path, keys, docs, postings)
+
+    def _swap(self, replaced: list[Segment], segment: DiskSegment) -> None:
+        """Point documents still living in `replaced` at their copy in `segment`."""
+        for local, key in enumerate(segment.keys):
+            if (ref := self._latest.get(key)) is not None and ref[0] in replaced:
+                self._latest[key] = (segment, local)
+
+    async def flush(self) -> None:
+        """Write the in-memory segment to disk, merging segments when there are too many."""
+        try:
+            if len(self.memory):
+                frozen, self.memory = self.memory, MemorySegment()
+                self.flushing.append(frozen)
+                try:
+                    if (segment := await self._merge([frozen])) is not None:
+                        self.segments.append(segment)
+                finally:
+                    self.flushing.remove(frozen)
+
+            # Segments of other slots belong to processes that may still be using them
+            owned = [s for s in self.segments if self._owns(s.path)]
+            if len(owned) > self.max_segments:
+                merging = owned
+                merged = await self._merge(merging)
+                self.segments = [
+                    *([merged] if merged is not None else []),
+                    *(s for s in self.segments if s not in merging),
+                ]
+                for old in merging:
+                    old.close()
+                    old.path.unlink(missing_ok=True)
+                logger.info(f"Merged {len(merging)} index segments")
+        except OSError as e:
+            logger.warning(f"Failed to flush the index: {e!r}")
+        finally:
+            self._flushing = None
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._flushing is None and len(self.memory):
+                self._flushing = asyncio.create_task(self.flush())
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._flushing is not None:
+            await self._flushing
+        if self.enabled and len(self.memory):
+            await self.flush()
+        for segment in self.segments:
+            segment.close()
+        self.segments.clear()
+        self._latest.clear()
+        if self._slot_lock is not None:
+            self._slot_lock.close()
+            self._slot_lock = None
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "comics": len(self._latest),
+            "segments": len(self.segments),
+            "unflushed": len(self.memory),
+            "queries": self.queries,
+            "avg_latency": self.query_time / self.queries if self.queries else 0.0,
+        }
+
+
+comic_index = ComicIndex(
+    root=config.index.path,
+    enabled=config.index.enabled,
+    flush_interval=config.index.flush_interval,
+    flush_docs=config.index.flush_docs,
+    max_segments=config.index.max_segments,
+)
+metrics.register("index", comic_index.snapshot)
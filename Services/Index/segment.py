@@ -0,0 +1,222 @@
+import itertools
+import json
+import mmap
+import os
+import re
+import struct
+import unicodedata
+from bisect import bisect_left, insort
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+MAGIC = b"CNIX"
+HEADER = struct.Struct("<4sIII")
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _is_cjk(char: str) -> bool:
+    code = ord(char)
+    return (
+        0x3040 <= code <= 0x30FF  # Kana
+        or 0x3400 <= code <= 0x4DBF
+        or 0x4E00 <= code <= 0x9FFF
+        or 0xF900 <= code <= 0xFAFF
+        or 0xAC00 <= code <= 0xD7AF  # Hangul
+    )
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into words, runs of CJK characters become overlapping bigrams."""
+    tokens: list[str] = []
+    for run in _WORD.findall(unicodedata.normalize("NFKC", text).casefold()):
+        for cjk, chars in itertools.groupby(run, _is_cjk):
+            span = "".join(chars)
+            if not cjk or len(span) == 1:
+                tokens.append(span)
+            else:
+                tokens.extend(span[i : i + 2] for i in range(len(span) - 1))
+    return tokens
+
+
+def document_terms(doc: dict[str, Any]) -> set[str]:
+    return set(
+        itertools.chain(
+            tokenize(doc["name"]),
+            *(tokenize(author) for author in doc["author"]),
+            *(tokenize(tag) for tag in doc["tags"]),
+        )
+    )
+
+
+class MemorySegment:
+    """Segment receiving new documents until it is flushed to disk."""
+
+    def __init__(self) -> None:
+        self.keys: list[str] = []
+        self.docs: list[dict[str, Any]] = []
+        self.postings: dict[str, list[int]] = {}
+        # Kept sorted as terms arrive, prefix queries never sort the vocabulary
+        self._sorted: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, key: str, doc: dict[str, Any]) -> int:
+        local = len(self.docs)
+        self.keys.append(key)
+        self.docs.append(doc)
+        for term in document_terms(doc):
+            if (postings := self.postings.get(term)) is None:
+                postings = self.postings[term] = []
+                insort(self._sorted, term)
+            postings.append(local)
+        return local
+
+    def doc(self, local: int) -> dict[str, Any]:
+        return self.docs[local]
+
+    def lookup(self, term: str) -> Sequence[int]:
+        return self.postings.get(term, ())
+
+    def prefixed(self, prefix: str) -> Iterator[tuple[str, Sequence[int]]]:
+        for term in itertools.islice(
+            self._sorted, bisect_left(self._sorted, prefix), None
+        ):
+            if not term.startswith(prefix):
+                break
+            yield term, self.postings[term]
+
+    def close(self) -> None:
+        pass
+
+
+def write_segment(
+    path: Path,
+    keys: list[str],
+    docs: list[dict[str, Any]],
+    postings: dict[str, list[int]],
+) -> None:
+    """
+    Write an immutable segment file. Terms are sorted by their UTF-8 bytes so
+    they can be binary searched in place, postings are little-endian uint32.
+    """
+    terms = sorted(postings, key=lambda term: term.encode("utf-8"))
+    blobs = [
+        [key.encode("utf-8") for key in keys],
+        [json.dumps(doc, ensure_ascii=False).encode("utf-8") for doc in docs],
+        [term.encode("utf-8") for term in terms],
+    ]
+    tables: list[bytes] = []
+    for blob in blobs:
+        tables.append(
+            struct.pack(f"<{len(blob) + 1}Q", 0, *itertools.accumulate(map(len, blob)))
+        )
+    post_counts = [len(postings[term]) for term in terms]
+    tables.append(
+        struct.pack(f"<{len(terms) + 1}Q", 0, *itertools.accumulate(post_counts))
+    )
+
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 1, len(docs), len(terms)))
+        for table in tables:
+            f.write(table)
+        for blob in blobs:
+            f.write(b"".join(blob))
+        # Postings are read as an array of uint32, keep them aligned
+        f.write(b"\0" * (-f.tell() % 4))
+        for term in terms:
+            f.write(struct.pack(f"<{len(postings[term])}I", *postings[term]))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class DiskSegment:
+    """Immutable segment read through a memory map, only its keys live in memory."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        magic, _, n_docs, n_terms = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an index segment")
+
+        position = HEADER.size
+        tables: list[memoryview] = []
+        for count in (n_docs, n_docs, n_terms, n_terms):
+            size = (count + 1) * 8
+            tables.append(self._view[position : position + size].cast("Q"))
+            position += size
+        self._key_offsets, self._doc_offsets, self._term_offsets, self._post_offsets = (
+            tables
+        )
+
+        self._keys_at = position
+        self._docs_at = self._keys_at + self._key_offsets[-1]
+        self._terms_at = self._docs_at + self._doc_offsets[-1]
+        postings_at = self._terms_at + self._term_offsets[-1]
+        postings_at += -postings_at % 4
+        self._postings = self._view[postings_at:].cast("I")
+        self.n_terms = n_terms
+        self.keys = [
+            self._entry(self._keys_at, self._key_offsets, i).decode("utf-8")
+            for i in range(n_docs)
+        ]
+
+    def _entry(self, at: int, offsets: memoryview, index: int) -> bytes:
+        return self._mm[at + offsets[index] : at + offsets[index + 1]]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def doc(self, local: int) -> dict[str, Any]:
+        return json.loads(self._entry(self._docs_at, self._doc_offsets, local))
+
+    def _term(self, index: int) -> bytes:
+        return self._entry(self._terms_at, self._term_offsets, index)
+
+    def _seek(self, term: bytes) -> int:
+        low, high = 0, self.n_terms
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < term:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _postings_of(self, index: int) -> Sequence[int]:
+        # A copy, a view into the map would keep `close` from releasing it
+        return self._postings[
+            self._post_offsets[index] : self._post_offsets[index + 1]
+        ].tolist()
+
+    def lookup(self, term: str) -> Sequence[int]:
+        encoded = term.encode("utf-8")
+        index = self._seek(encoded)
+        if index < self.n_terms and self._term(index) == encoded:
+            return self._postings_of(index)
+        return ()
+
+    def prefixed(self, prefix: str) -> Iterator[tuple[str, Sequence[int]]]:
+        encoded = prefix.encode("utf-8")
+        for index in range(self._seek(encoded), self.n_terms):
+            if not (term := self._term(index)).startswith(encoded):
+                break
+            yield term.decode("utf-8"), self._postings_of(index)
+
+    def close(self) -> None:
+        for table in (
+            self._key_offsets,
+            self._doc_offsets,
+            self._term_offsets,
+            self._post_offsets,
+            self._postings,
+        ):
+            table.release()
+        self._view.release()
+        self._mm.close()
@@ -1,37 +1,125 @@
+import ipaddress
+
 from fastapi import Request
 from slowapi import Limiter
 from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
 from starlette import status
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from Models.response import HTTPException, StandardResponse
+from Services.Config.config import config
+
+trusted_proxies = [
+    ipaddress.ip_network(proxy, strict=False)
+    for proxy in config.limiter.trusted_proxies
+]
+
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def get_client_address(request: Request) -> str:
+    """
+    Resolve the client address behind trusted proxies. X-Forwarded-For is only
+    honoured when the direct peer is trusted, and is walked from the right so
+    a client can't spoof its address by prepending hops.
+    """
+    address = request.client.host if request.client else "127.0.0.1"
+    if not _is_trusted(address) or not (
+        forwarded := request.headers.get("x-forwarded-for")
+    ):
+        return address
+
+    for hop in reversed([hop.strip() for hop in forwarded.split(",")]):
+        if hop and not _is_trusted(hop):
+            return hop
+    return address
+
 
-from Models.response import HTTPException
+def route_limit(route: str, default: str) -> str:
+    return config.limiter.routes.get(route, default)
 
-freq_limiter = Limiter(key_func=get_remote_address, default_limits=["100/minute"])
+
+# Counters live in `storage_uri`, point it at a shared store when running several workers
+freq_limiter = Limiter(
+    key_func=get_client_address,
+    default_limits=config.limiter.default_limits,
+    storage_uri=config.limiter.storage_uri,
+    strategy=config.limiter.strategy,
+    key_prefix="cnm",
+    in_memory_fallback_enabled=True,
+)
 
 
 async def RateLimitExceeded_handler(request: Request, exc: RateLimitExceeded):
     raise HTTPException(429, f"Rate limit exceeded: {exc.detail}")
 
 
-# -*- author: abdusco<https://github.com/abdusco> -*-
-class LimitUploadSize(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp, max_upload_size: int) -> None:
-        super().__init__(app)
+class LimitUploadSize:
+    """
+    Upload Size Limiter
+    ~~~~~~~~~~~~~~~~~~~~~~
+    ASGI middleware capping request bodies. A declared Content-Length over the
+    limit is rejected straight away, and the bytes of every request are
+    counted as the body streams in, so chunked uploads and bodies without a
+    header announcing them are limited too. `route_limits` maps path
+    prefixes to their own limit, the longest matching prefix wins.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_upload_size: int,
+        route_limits: dict[str, int] | None = None,
+    ) -> None:
+        self.app = app
         self.max_upload_size = max_upload_size
+        self.route_limits = sorted(
+            (route_limits or {}).items(), key=lambda item: len(item[0]), reverse=True
+        )
+
+    def _limit(self, path: str) -> int:
+        for prefix, limit in self.route_limits:
+            if path.startswith(prefix):
+                return limit
+        return self.max_upload_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        content_length: int | None = None
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                content_length = int(value) if value.isdigit() else None
+                break
+
+        # Headers can't be trusted to announce a body, it is counted either way
+        limit = self._limit(scope["path"])
+        if content_length is not None and content_length > limit:
+            response = StandardResponse[None](
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                message=f"Request body is too large: {content_length} > {limit}",
+            )
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(
+                        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        f"Request body is too large: more than {limit}",
+                    )
+            return message
 
-    async def dispatch(
-        self, request: Request, call_next: RequestResponseEndpoint
-    ) -> Response:
-        if request.method == "POST":
-            if "content-length" not in request.headers:
-                raise HTTPException(411, "Content-Length header is required")
-            content_length = int(request.headers["content-length"])
-            if content_length > self.max_upload_size:
-                raise HTTPException(
-                    status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    f"Request body is too large: {content_length} > {self.max_upload_size}",
-                )
-        return await call_next(request)
+        await self.app(scope, limited_receive, send)
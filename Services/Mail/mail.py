@@ -1,5 +1,9 @@
+import asyncio
+import logging
 import secrets
 import smtplib
+import threading
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from enum import Enum
@@ -8,6 +12,9 @@ from email_validator import EmailNotValidError, validate_email
 from fastapi import HTTPException
 
 from Services.Config.config import config
+from Services.Metrics.metrics import metrics
+
+logger = logging.getLogger("[Mail]")
 
 
 class Purpose(Enum):
@@ -26,22 +33,180 @@ with open("Templates/captcha.html", "r", encoding="utf-8") as f:
     captcha_template = f.read()
 
 
-def _send_email(addr: str, subject: str, body: str):
-    smtp = smtplib.SMTP_SSL(config.email.host, port=config.email.port, timeout=5)
-    smtp.login(config.email.address, config.email.password)
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = config.email.address
-    msg["To"] = addr
-    msg.attach(MIMEText(body, "html"))
-    smtp.sendmail(config.email.address, addr, msg.as_string())
-    smtp.quit()
+class MailMessage:
+    addr: str
+    subject: str
+    body: str
+    attempts: int
+    enqueued_at: float
+
+    def __init__(self, addr: str, subject: str, body: str) -> None:
+        self.addr = addr
+        self.subject = subject
+        self.body = body
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+
+    def as_string(self) -> str:
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = self.subject
+        msg["From"] = config.email.address
+        msg["To"] = self.addr
+        msg.attach(MIMEText(self.body, "html"))
+        return msg.as_string()
+
+
+def is_permanent(e: Exception) -> bool:
+    """Whether the server rejected the email for good, retrying can't help."""
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    return isinstance(e, smtplib.SMTPResponseException) and e.smtp_code >= 500
+
+
+class SMTPConnection:
+    """A persistent SMTP connection that reconnects when the server drops it."""
+
+    def __init__(self) -> None:
+        self._smtp: smtplib.SMTP | None = None
+        # Closing waits for a send still running in its thread
+        self._lock = threading.RLock()
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp_cls = smtplib.SMTP_SSL if config.email.use_ssl else smtplib.SMTP
+        smtp = smtp_cls(
+            config.email.host, port=config.email.port, timeout=config.email.timeout
+        )
+        if config.email.password:
+            smtp.login(config.email.address, config.email.password)
+        return smtp
+
+    def send(self, msg: MailMessage) -> None:
+        with self._lock:
+            if self._smtp is None:
+                self._smtp = self._connect()
+            try:
+                self._smtp.sendmail(config.email.address, msg.addr, msg.as_string())
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Idle connections get closed by the server, reconnect once and retry
+                self.close()
+                self._smtp = self._connect()
+                self._smtp.sendmail(config.email.address, msg.addr, msg.as_string())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._smtp is None:
+                return
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+class MailQueue:
+    """
+    Mail Queue
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Background delivery for outgoing emails. Endpoints only enqueue a message,
+    a fixed number of workers each keep one SMTP connection open and deliver
+    from the queue, failed messages are retried with exponential backoff.
+    """
+
+    def __init__(
+        self, workers: int, max_size: int, max_retries: int, retry_backoff: float
+    ) -> None:
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue: asyncio.Queue[MailMessage] = asyncio.Queue(maxsize=max_size)
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._workers: list[asyncio.Task[None]] = []
+        self._retries: set[asyncio.Task[None]] = set()
+
+    def enqueue(self, addr: str, subject: str, body: str) -> None:
+        try:
+            self.queue.put_nowait(MailMessage(addr, subject, body))
+        except asyncio.QueueFull:
+            logger.warning(f"Mail queue is full, dropping email to {addr}")
+            raise HTTPException(status_code=503, detail="Server busy, try again later")
+
+    async def _retry(self, msg: MailMessage) -> None:
+        await asyncio.sleep(self.retry_backoff * 2 ** (msg.attempts - 1))
+        await self.queue.put(msg)
+
+    async def _work(self) -> None:
+        connection = SMTPConnection()
+        try:
+            while True:
+                msg = await self.queue.get()
+                try:
+                    await asyncio.to_thread(connection.send, msg)
+                except Exception as e:
+                    msg.attempts += 1
+                    if is_permanent(e):
+                        # The connection itself is still usable
+                        self.failed += 1
+                        logger.error(f"Email to {msg.addr} was rejected: {e!r}")
+                        continue
+                    await asyncio.to_thread(connection.close)
+                    if msg.attempts >= self.max_retries:
+                        self.failed += 1
+                        logger.error(f"Failed to send email to {msg.addr}: {e!r}")
+                    else:
+                        self.retried += 1
+                        logger.warning(
+                            f"Failed to send email to {msg.addr}, retrying: {e!r}"
+                        )
+                        task = asyncio.create_task(self._retry(msg))
+                        self._retries.add(task)
+                        task.add_done_callback(self._retries.discard)
+                else:
+                    latency = time.monotonic() - msg.enqueued_at
+                    self.sent += 1
+                    self.total_latency += latency
+                    self.max_latency = max(self.max_latency, latency)
+                finally:
+                    self.queue.task_done()
+        finally:
+            await asyncio.to_thread(connection.close)
+
+    def start(self) -> None:
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in [*self._workers, *self._retries]:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def snapshot(self) -> dict[str, int | float]:
+        return {
+            "depth": self.queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "avg_latency": self.total_latency / self.sent if self.sent else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+mail_queue = MailQueue(
+    workers=config.email.workers,
+    max_size=config.email.queue_size,
+    max_retries=config.email.max_retries,
+    retry_backoff=config.email.retry_backoff,
+)
+metrics.register("mail", mail_queue.snapshot)
 
 
 def send_captcha(addr: str, purpose: Purpose, ip: str) -> str:
     captcha = str(secure_rng.randrange(100001, 999999))
     body = captcha_template.format(captcha=captcha, purpose=purpose.__str__(), ip=ip)
-    _send_email(addr, purpose.__str__(), body)
+    mail_queue.enqueue(addr, purpose.__str__(), body)
     return captcha
 
 
@@ -0,0 +1,27 @@
+from typing import Any, Callable
+
+Collector = Callable[[], dict[str, Any]]
+
+
+class Metrics:
+    """
+    Metrics Registry
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Services register a collector returning a snapshot of their counters,
+    the registry gathers all of them on demand.
+    """
+
+    def __init__(self) -> None:
+        self._collectors: dict[str, Collector] = {}
+
+    def register(self, name: str, collector: Collector) -> None:
+        self._collectors[name] = collector
+
+    def unregister(self, name: str) -> None:
+        self._collectors.pop(name, None)
+
+    def collect(self) -> dict[str, dict[str, Any]]:
+        return {name: collector() for name, collector in self._collectors.items()}
+
+
+metrics = Metrics()
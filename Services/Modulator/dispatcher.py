@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from functools import partial
+from typing import Any, AsyncIterator
+
+from fastapi import HTTPException
+
+from Models.comic import AlbumResult, BaseComicInfo, ComicInfo, SourceStatus
+from Models.plugins import Plugin
+from Models.requests import AlbumRef
+from Services.Cache.album import album_cache
+from Services.Config.config import config
+from Services.Index.index import comic_index
+from Services.Modulator.guard import SourceTimeout
+from Services.Modulator.manager import plugin_manager
+
+logger = logging.getLogger("[CNM]")
+
+SearchOutcome = tuple[str, SourceStatus, list[BaseComicInfo]]
+
+
+async def _search_source(
+    src: str, keyword: str, extras: dict[str, Any]
+) -> SearchOutcome:
+    # Outside of the deadline, a lazily loaded plugin may be importing
+    if (plugin := await plugin_manager.get_source(src)) is None:
+        return src, SourceStatus(status="error", message="Source not found"), []
+
+    try:
+        async with asyncio.timeout(config.plugin.get_timeout(src)):
+            comics: list[BaseComicInfo] = await plugin.call("search", keyword, **extras)
+    except (TimeoutError, SourceTimeout):
+        logger.warning(f"Source {src} timed out while searching {keyword!r}")
+        return src, SourceStatus(status="timeout"), []
+    except Exception as e:
+        logger.warning(f"Source {src} failed while searching {keyword!r}: {e!r}")
+        message = e.detail if isinstance(e, HTTPException) else str(e)
+        return src, SourceStatus(status="error", message=message), []
+
+    comic_index.add(src, comics)
+    return src, SourceStatus(status="ok", count=len(comics)), comics
+
+
+async def search_sources(
+    sources: list[str], keyword: str, extras: dict[str, Any] | None = None
+) -> AsyncIterator[SearchOutcome]:
+    """
+    Search Sources
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Query every requested source concurrently and yield each outcome as soon as
+    that source finishes, fails or runs out of its deadline.
+    """
+    tasks = [
+        asyncio.create_task(_search_source(src, keyword, extras or {}))
+        for src in dict.fromkeys(sources)
+    ]
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _album_failed(src: str, album_id: str, e: Exception) -> AlbumResult:
+    if isinstance(e, (TimeoutError, SourceTimeout)):
+        logger.warning(f"Source {src} timed out while fetching album {album_id}")
+        return AlbumResult(source=src, album_id=album_id, status="timeout")
+    logger.warning(f"Source {src} failed while fetching album {album_id}: {e!r}")
+    message = e.detail if isinstance(e, HTTPException) else str(e)
+    return AlbumResult(source=src, album_id=album_id, status="error", message=message)
+
+
+async def _fetch_album(
+    plugin: Plugin, src: str, album_id: str, slots: asyncio.Semaphore
+) -> AlbumResult:
+    try:
+        async with slots:
+            album: ComicInfo = await plugin.call("album", album_id)
+    except Exception as e:
+        return _album_failed(src, album_id, e)
+    return AlbumResult(
+        source=src,
+        album_id=album_id,
+        status="ok",
+        album=album_cache.store(src, album_id, album),
+    )
+
+
+async def _fetch_batch(
+    plugin: Plugin, src: str, album_ids: list[str]
+) -> list[AlbumResult]:
+    try:
+        albums: dict[str, ComicInfo] = await plugin.call("albums", album_ids)
+    except Exception as e:
+        return [_album_failed(src, album_id, e) for album_id in album_ids]
+    return [
+        (
+            AlbumResult(
+                source=src,
+                album_id=album_id,
+                status="ok",
+                album=album_cache.store(src, album_id, albums[album_id]),
+            )
+            if album_id in albums
+            else AlbumResult(
+                source=src, album_id=album_id, status="error", message="Album not found"
+            )
+        )
+        for album_id in album_ids
+    ]
+
+
+async def _fetch_source(src: str, album_ids: list[str]) -> list[AlbumResult]:
+    if (plugin := await plugin_manager.get_source(src)) is None:
+        return [
+            AlbumResult(
+                source=src,
+                album_id=album_id,
+                status="error",
+                message="Source not found",
+            )
+            for album_id in album_ids
+        ]
+
+    results: dict[str, AlbumResult] = {}
+    missing: list[str] = []
+    for album_id in album_ids:
+        if (
+            album := album_cache.lookup(
+                src, album_id, partial(plugin.call, "album", album_id)
+            )
+        ) is not None:
+            results[album_id] = AlbumResult(
+                source=src, album_id=album_id, status="ok", album=album
+            )
+        else:
+            missing.append(album_id)
+
+    if missing and plugin.capabilities.batch:
+        fetched = await _fetch_batch(plugin, src, missing)
+    elif missing:
+        # Kept below the plugin's own concurrency, so a large batch doesn't time
+        # out queueing behind its own calls
+        slots = asyncio.Semaphore(config.plugin.batch_concurrency)
+        fetched = await asyncio.gather(
+            *(_fetch_album(plugin, src, album_id, slots) for album_id in missing)
+        )
+    else:
+        fetched = []
+    results.update((result.album_id, result) for result in fetched)
+    return [results[album_id] for album_id in album_ids]
+
+
+async def fetch_albums(albums: list[AlbumRef]) -> dict[str, AlbumResult]:
+    """
+    Fetch Albums
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Fetch many albums across sources at once. Albums are grouped by source and
+    the sources queried concurrently, each through its batch method when the
+    plugin has one. Results are keyed by `source/album_id`, and a failure only
+    affects the albums it concerns.
+    """
+    grouped: dict[str, dict[str, None]] = {}
+    for ref in albums:
+        grouped.setdefault(ref.source, {})[ref.album_id] = None
+
+    outcomes = await asyncio.gather(
+        *(_fetch_source(src, list(album_ids)) for src, album_ids in grouped.items())
+    )
+    return {
+        f"{result.source}/{result.album_id}": result
+        for results in outcomes
+        for result in results
+    }
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Literal
+
+from fastapi import HTTPException
+
+from Services.Config.config import PluginPolicy
+
+logger = logging.getLogger("[CNM]")
+
+
+class SourceUnavailable(HTTPException):
+    def __init__(self, plugin: str) -> None:
+        super().__init__(
+            status_code=503, detail=f"Source {plugin} is temporarily unavailable"
+        )
+
+
+class SourceOverloaded(HTTPException):
+    def __init__(self, plugin: str) -> None:
+        super().__init__(status_code=503, detail=f"Source {plugin} is overloaded")
+
+
+class SourceTimeout(HTTPException):
+    def __init__(self, plugin: str) -> None:
+        super().__init__(status_code=504, detail=f"Source {plugin} timed out")
+
+
+class CallGuard:
+    """
+    Call Guard
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Protects the server from a misbehaving plugin. At most `max_concurrency`
+    calls run at once, a call waiting longer than `queue_timeout` for a slot
+    is turned away as overload, and a running call is bounded by
+    `call_timeout`. A slot is only freed once its call has really finished,
+    a synchronous method keeps its thread, and its slot, past a timeout.
+    After `failure_threshold` consecutive failures the circuit opens so calls
+    fail fast. Once `recovery_time` has passed a single probe call is let
+    through, closing the circuit again if it succeeds.
+    """
+
+    def __init__(self, name: str, policy: PluginPolicy) -> None:
+        self.name = name
+        self.policy = policy
+        self.state: Literal["closed", "open", "half_open"] = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.active = 0
+        self.queued = 0
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.overloaded = 0
+        self._slots = asyncio.Semaphore(policy.max_concurrency)
+        self._probing = False
+
+    def _admit(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.policy.recovery_time:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def _succeeded(self) -> None:
+        self.failures = 0
+        if self.state != "closed":
+            logger.info(f"Plugin {self.name} recovered, closing its circuit")
+            self.state = "closed"
+
+    def _failed(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or (
+            self.state == "closed" and self.failures >= self.policy.failure_threshold
+        ):
+            logger.warning(
+                f"Plugin {self.name} failed {self.failures} times in a row, "
+                f"opening its circuit for {self.policy.recovery_time:g}s"
+            )
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    async def _acquire(self) -> None:
+        self.queued += 1
+        try:
+            async with asyncio.timeout(self.policy.queue_timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            # Too busy rather than broken, the circuit is left alone
+            self.overloaded += 1
+            raise SourceOverloaded(self.name) from None
+        finally:
+            self.queued -= 1
+
+    def _release(self, task: "asyncio.Future[Any]") -> None:
+        self.active -= 1
+        self._slots.release()
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        if not self._admit():
+            self.rejected += 1
+            raise SourceUnavailable(self.name)
+
+        probe = self.state == "half_open"
+        try:
+            await self._acquire()
+        except BaseException:
+            if probe:
+                self._probing = False
+            raise
+
+        self.calls += 1
+        self.active += 1
+        task = asyncio.ensure_future(call())
+        task.add_done_callback(self._release)
+        try:
+            try:
+                done, _ = await asyncio.wait({task}, timeout=self.policy.call_timeout)
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            if not done:
+                task.cancel()
+                raise TimeoutError
+            result = task.result()
+        except TimeoutError:
+            self.timeouts += 1
+            self._failed()
+            raise SourceTimeout(self.name) from None
+        except HTTPException as e:
+            # Plugins reject bad input with 4xx, that says nothing about the source's health
+            if e.status_code >= 500:
+                self.errors += 1
+                self._failed()
+            else:
+                self._succeeded()
+            raise
+        except Exception:
+            self.errors += 1
+            self._failed()
+            raise
+        else:
+            self._succeeded()
+            return result
+        finally:
+            if probe:
+                self._probing = False
+
+    def snapshot(self) -> dict[str, Any]:
+        retry_in = (
+            max(0.0, self.policy.recovery_time - (time.monotonic() - self.opened_at))
+            if self.state == "open"
+            else None
+        )
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in": retry_in,
+            "active": self.active,
+            "queued": self.queued,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "overloaded": self.overloaded,
+        }
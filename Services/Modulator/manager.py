@@ -1,43 +1,136 @@
+import asyncio
 import importlib
 import json
 import os
+import sys
+import time
 from pathlib import Path
-from typing import Set
+from typing import Any
 import logging
 
 import toml
 from packaging.version import Version, parse
 
 from Models.plugins import BasePlugin, Plugin
+from Models.response import SourceDetail
 from Services.Config.config import config
+from Services.Image.shaper import image_shaper
+from Services.Metrics.metrics import metrics
+from Services.Modulator.guard import CallGuard
+from Services.Modulator.singleflight import SingleFlight
+from Services.Modulator.worker import RemoteInstance, WorkerPool
 
 logger = logging.getLogger("[CNM]")
 
 
+class PluginManifest:
+    name: str
+    version: str
+    cnm_version: str
+    source: list[str]
+    service: dict[str, list[str]]
+    path: Path
+
+    def __init__(
+        self,
+        name: str,
+        version: str,
+        cnm_version: str,
+        source: list[str],
+        service: dict[str, list[str]],
+        path: Path,
+    ) -> None:
+        self.name = name
+        self.version = version
+        self.cnm_version = cnm_version
+        self.source = source
+        self.service = service
+        self.path = path
+
+
 class PluginManager:
     cnm_version = Version("0.3.1")
 
     def __init__(self):
         self.strict = config.plugin.strict_load
-        self.plugins: Set[Plugin] = set()
-        self.registered_source: Set[str] = set()
+        self.max_workers = config.plugin.max_workers
+        self.plugins: dict[str, Plugin] = {}
+        # Source id -> plugin, so routing a request is a single lookup
+        self.sources: dict[str, Plugin] = {}
+        # Source id -> manifest of a plugin registered but not imported yet
+        self.pending: dict[str, PluginManifest] = {}
+        self.load_times: dict[str, float] = {}
+        self._loading: dict[str, asyncio.Task[Plugin | None]] = {}
+        self._lock = asyncio.Lock()
+        self._watcher: asyncio.Task[None] | None = None
 
-    def load_plugins(self) -> None:
+    async def load_plugins(self) -> None:
+        """
+        Register every plugin in `Plugins/` from its manifest, then import and
+        `on_load()` them one after another (`sequential`), all at once in
+        threads (`parallel`), or on the first request to their source (`lazy`).
+        """
+        manifests: list[PluginManifest] = []
         for plugin in os.listdir("Plugins"):
             if not plugin.startswith("_") and os.path.isdir(
                 os.path.join("Plugins", plugin)
             ):
-                if not self.load_plugin(
+                manifest = self.read_manifest(
                     Path(os.path.join("Plugins", plugin)).resolve()
-                ):
-                    logger.error("An error occurred while loading plugin")
-                    if self.strict:
-                        logger.error(
-                            f"According to **STRICT** mode, server will abort if plugin {plugin} fails to load"
-                        )
-                        raise RuntimeError("An error occurred while loading plugins")
+                )
+                if manifest is None:
+                    self._load_failed([plugin])
+                    continue
+                self.pending.update(dict.fromkeys(manifest.source, manifest))
+                manifests.append(manifest)
+
+        match config.plugin.load_mode:
+            case "lazy":
+                logger.info(
+                    f"Registered {len(manifests)} plugins, loading them on first use"
+                )
+                return
+            case "parallel":
+                plugins = await asyncio.gather(
+                    *(self.start_plugin(manifest) for manifest in manifests)
+                )
+            case _:
+                plugins = [await self.start_plugin(manifest) for manifest in manifests]
+
+        failed: list[str] = []
+        for manifest, plugin in zip(manifests, plugins):
+            self._release(manifest)
+            if plugin is None:
+                failed.append(manifest.path.name)
+            else:
+                self._register(plugin)
+        if failed:
+            self._load_failed(failed)
+
+    def _load_failed(self, plugins: list[str]) -> None:
+        logger.error("An error occurred while loading plugin")
+        if self.strict:
+            logger.error(
+                f"According to **STRICT** mode, server will abort if plugin {', '.join(plugins)} fails to load"
+            )
+            raise RuntimeError("An error occurred while loading plugins")
 
     def load_plugin(self, plugin_dir: Path) -> bool:
+        if (manifest := self.read_manifest(plugin_dir)) is None:
+            return False
+        if (plugin := self.create_plugin(manifest)) is None:
+            return False
+        self._register(plugin)
+        return True
+
+    def read_manifest(
+        self, plugin_dir: Path, replace: Plugin | None = None
+    ) -> PluginManifest | None:
+        """
+        Read and check a plugin's `pyproject.toml`, without importing it. The
+        name and sources of `replace`, the plugin being reloaded, are not
+        treated as conflicts.
+        """
         logger.info(f"Loading plugin {plugin_dir.name}")
         try:
             with open(
@@ -45,9 +138,17 @@ class PluginManager:
             ) as f:
                 plugin_info = toml.load(f)
 
-            if (plugin_name := plugin_info["project"]["name"]) in self.plugins:
+            plugin_name = plugin_info["project"]["name"]
+            if replace is not None and plugin_name != replace.name:
+                logger.error(
+                    f"Failed to reload {replace.name}, plugin has been renamed to {plugin_name}"
+                )
+                return None
+            if (replace is None and plugin_name in self.plugins) or any(
+                manifest.name == plugin_name for manifest in self.pending.values()
+            ):
                 logger.warning(f"Plugin {plugin_name} already loaded")
-                return False
+                return None
 
             version = parse(plugin_info["tool"]["cnm"]["version"])
             if (
@@ -57,7 +158,7 @@ class PluginManager:
                 logger.error(
                     f"Plugin {plugin_name}'s CNM version {version} is not compatible with server's CNM version {self.cnm_version}"
                 )
-                return False
+                return None
 
             src_list: list[str] = []
             for src in plugin_info["tool"]["cnm"]["source"]:
@@ -65,72 +166,326 @@ class PluginManager:
                     logger.error(
                         f"Failed to load {plugin_name}, source id {src} is too long"
                     )
-                    return False
-                if src in self.registered_source:
+                    return None
+                if src in src_list or (
+                    self.is_registered(src)
+                    and (replace is None or src not in replace.source)
+                ):
                     logger.error(
-                        f"Failed to load {plugin_name}, source {plugin_info['plugin']['source']} has already been registered"
+                        f"Failed to load {plugin_name}, source {src} has already been registered"
                     )
-                    return False
+                    return None
                 else:
                     logger.info(f"Registering source {src}...")
                     src_list.append(src)
 
+            return PluginManifest(
+                name=plugin_name,
+                version=plugin_info["project"]["version"],
+                cnm_version=plugin_info["tool"]["cnm"]["version"],
+                source=src_list,
+                service=plugin_info["tool"]["cnm"]["service"],
+                path=plugin_dir,
+            )
+        except FileNotFoundError:
+            logger.error(f"Failed to load plugin {plugin_dir.name}'s information")
+            return None
+        except KeyError:
+            logger.error(f"Failed to load plugin {plugin_dir.name}'s information")
+            return None
+        except Exception as e:
+            logger.error(
+                f"Unknown error occurred while loading plugin {plugin_dir.name}"
+            )
+            logger.exception(e)
+            return None
+
+    def create_plugin(
+        self, manifest: PluginManifest, fresh: bool = False
+    ) -> Plugin | None:
+        """
+        Import a plugin and run its `on_load()`, blocking until it is done.
+        With `fresh`, the plugin's modules are imported again from disk, the
+        previously imported ones stay alive for any instance still using them.
+        """
+        plugin_dir = manifest.path
+        started = time.perf_counter()
+        try:
+            if fresh:
+                package = f"Plugins.{plugin_dir.name}"
+                for module_name in [
+                    name
+                    for name in sys.modules
+                    if name == package or name.startswith(f"{package}.")
+                ]:
+                    del sys.modules[module_name]
+                importlib.invalidate_caches()
             module = importlib.import_module(f"Plugins.{plugin_dir.name}.main")
 
-            if issubclass(entry := getattr(module, plugin_dir.name), BasePlugin):
-                instance = entry()
-                if instance.on_load():
-                    self.plugins.add(
-                        Plugin(
-                            name=plugin_name,
-                            version=plugin_info["project"]["version"],
-                            cnm_version=plugin_info["tool"]["cnm"]["version"],
-                            source=plugin_info["tool"]["cnm"]["source"],
-                            service=plugin_info["tool"]["cnm"]["service"],
-                            instance=instance,
-                        )
-                    )
-                else:
-                    raise ImportError
-                logger.info(f"Plugin {plugin_dir.name} Loaded")
-                self.registered_source.update(src_list)
-                return True
-            else:
+            if not issubclass(entry := getattr(module, plugin_dir.name), BasePlugin):
                 logger.error(f"Plugin {plugin_dir.name} is not a valid plugin")
-                return False
+                return None
+
+            instance = entry()
+            if not instance.on_load():
+                raise ImportError
         except ModuleNotFoundError as module_err:
             logger.error(
                 f" Failed to load {plugin_dir.name}, plugin requires some dependencies: {module_err.msg}"
             )
-            return False
-        except FileNotFoundError:
-            logger.error(f"Failed to load plugin {plugin_dir.name}'s information")
-            return False
+            return None
         except ImportError:
-            logger.error(
-                f"Failed to import plugin {plugin_dir.name}'s main module"
-            )
-            return False
-        except KeyError:
-            logger.error(f"Failed to load plugin {plugin_dir.name}'s information")
-            return False
+            logger.error(f"Failed to import plugin {plugin_dir.name}'s main module")
+            return None
         except Exception as e:
             logger.error(
                 f"Unknown error occurred while loading plugin {plugin_dir.name}"
             )
             logger.exception(e)
-            return False
+            return None
+
+        load_time = self.load_times[manifest.name] = time.perf_counter() - started
+        logger.info(f"Plugin {plugin_dir.name} Loaded in {load_time:.2f}s")
+        return Plugin(
+            name=manifest.name,
+            version=manifest.version,
+            cnm_version=manifest.cnm_version,
+            source=manifest.source,
+            service=manifest.service,
+            instance=instance,
+            max_workers=self.max_workers,
+            guard=CallGuard(manifest.name, config.plugin.get_policy(manifest.name)),
+            flights=SingleFlight(config.plugin.coalesce),
+            path=plugin_dir,
+        )
+
+    async def spawn_plugin(self, manifest: PluginManifest) -> Plugin | None:
+        """Start a plugin in its own worker processes."""
+        started = time.perf_counter()
+        workers = WorkerPool(
+            manifest.path, processes=config.plugin.processes, threads=self.max_workers
+        )
+        try:
+            info = await workers.start()
+        except Exception as e:
+            logger.error(str(e))
+            return None
+
+        load_time = self.load_times[manifest.name] = time.perf_counter() - started
+        logger.info(
+            f"Plugin {manifest.path.name} Loaded in {load_time:.2f}s with {config.plugin.processes} workers"
+        )
+        return Plugin(
+            name=manifest.name,
+            version=manifest.version,
+            cnm_version=manifest.cnm_version,
+            source=manifest.source,
+            service=manifest.service,
+            instance=RemoteInstance(workers, info["methods"], info["auto_login"]),  # type: ignore
+            max_workers=self.max_workers,
+            guard=CallGuard(manifest.name, config.plugin.get_policy(manifest.name)),
+            flights=SingleFlight(config.plugin.coalesce),
+            path=manifest.path,
+            workers=workers,
+            interfaces={
+                key: info[key] for key in ("auth", "reader", "batch", "shaper")
+            },
+        )
+
+    async def start_plugin(
+        self, manifest: PluginManifest, fresh: bool = False
+    ) -> Plugin | None:
+        if config.plugin.isolation == "process":
+            return await self.spawn_plugin(manifest)
+        return await asyncio.to_thread(self.create_plugin, manifest, fresh)
+
+    def _register(self, plugin: Plugin) -> None:
+        self.plugins[plugin.name] = plugin
+        self.sources.update(dict.fromkeys(plugin.source, plugin))
+
+    def _release(self, manifest: PluginManifest) -> None:
+        for src in manifest.source:
+            self.pending.pop(src, None)
+
+    async def _load_pending(self, manifest: PluginManifest) -> Plugin | None:
+        try:
+            plugin = await self.start_plugin(manifest)
+        finally:
+            self._loading.pop(manifest.name, None)
+            self._release(manifest)
+        if plugin is not None:
+            self._register(plugin)
+        return plugin
+
+    async def add_plugin(self, plugin_dir: Path) -> bool:
+        """Load a plugin while the server is running."""
+        async with self._lock:
+            if (manifest := self.read_manifest(plugin_dir)) is None:
+                return False
+            plugin = await self.start_plugin(manifest, fresh=True)
+            if plugin is None:
+                return False
+            self._register(plugin)
+            return True
+
+    async def reload_plugin(self, name: str) -> bool:
+        """
+        Load a new version of a plugin next to the running one and switch its
+        sources over once `on_load()` succeeded. The old version is unloaded
+        after its in-flight calls are drained, and keeps serving if the new one
+        fails to load.
+        """
+        async with self._lock:
+            if (old := self.plugins.get(name)) is None or old.path is None:
+                return False
+            if (manifest := self.read_manifest(old.path, replace=old)) is None:
+                return False
+            plugin = await self.start_plugin(manifest, fresh=True)
+            if plugin is None:
+                logger.error(
+                    f"Failed to reload plugin {name}, keeping version {old.version}"
+                )
+                return False
 
-    def unload_plugins(self) -> None:
+            for src in old.source:
+                if src not in plugin.source:
+                    del self.sources[src]
+            self._register(plugin)
+            logger.info(f"Plugin {name} reloaded, {old.version} -> {plugin.version}")
+        await self._retire(old)
+        return True
+
+    async def unload_plugin(self, name: str) -> bool:
+        async with self._lock:
+            if (plugin := self.plugins.pop(name, None)) is None:
+                return False
+            for src in plugin.source:
+                self.sources.pop(src, None)
+        await self._retire(plugin)
+        return True
+
+    async def _retire(self, plugin: Plugin) -> None:
+        image_shaper.retire(plugin)
+        if not await plugin.drain(config.plugin.drain_timeout):
+            logger.warning(
+                f"Plugin {plugin.name} still has {plugin.active} calls running, unloading anyway"
+            )
+        try:
+            await plugin.unload(config.plugin.drain_timeout)
+        except Exception as e:
+            logger.exception(f"Plugin {plugin.name} failed to unload", exc_info=e)
+        logger.info(f"Plugin {plugin.name} unloaded")
+
+    @staticmethod
+    def _fingerprint(plugin_dir: Path) -> tuple[float, int]:
+        files = [
+            path
+            for path in plugin_dir.rglob("*")
+            if path.suffix in (".py", ".toml") and "__pycache__" not in path.parts
+        ]
+        return max((path.stat().st_mtime for path in files), default=0.0), len(files)
+
+    async def _watch(self, interval: float) -> None:
+        fingerprints: dict[str, tuple[float, int]] = {}
+        while True:
+            await asyncio.sleep(interval)
+            for name, plugin in list(self.plugins.items()):
+                if plugin.path is None:
+                    continue
+                try:
+                    fingerprint = await asyncio.to_thread(
+                        self._fingerprint, plugin.path
+                    )
+                except OSError:
+                    continue
+                previous = fingerprints.setdefault(name, fingerprint)
+                if fingerprint != previous:
+                    fingerprints[name] = fingerprint
+                    logger.info(f"Plugin {name} changed on disk, reloading")
+                    await self.reload_plugin(name)
+
+    def start_watcher(self) -> None:
+        if config.plugin.watch and self._watcher is None:
+            self._watcher = asyncio.create_task(
+                self._watch(config.plugin.watch_interval)
+            )
+
+    def stop_watcher(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    async def unload_plugins(self) -> None:
+        self.pending.clear()
+        self.sources.clear()
         while len(self.plugins) > 0:
-            plugin = self.plugins.pop()
-            plugin.instance.on_unload()
+            _, plugin = self.plugins.popitem()
+            try:
+                await plugin.unload(config.plugin.drain_timeout)
+            except Exception as e:
+                logger.exception(f"Plugin {plugin.name} failed to unload", exc_info=e)
             logger.info(f"Plugin {plugin.name} unloaded")
 
-    def get_source(self, source: str) -> Plugin | None:
-        return next(
-            (plugin for plugin in self.plugins if source in plugin.source), None
-        )
+    def is_registered(self, source: str) -> bool:
+        return source in self.sources or source in self.pending
+
+    def registered_sources(self) -> set[str]:
+        return {*self.sources, *self.pending}
+
+    async def get_source(self, source: str) -> Plugin | None:
+        if (plugin := self.sources.get(source)) is not None:
+            return plugin
+        if (manifest := self.pending.get(source)) is None:
+            return None
+
+        # Lazy mode, the first request to any of the plugin's sources loads it
+        if (task := self._loading.get(manifest.name)) is None:
+            task = self._loading[manifest.name] = asyncio.create_task(
+                self._load_pending(manifest)
+            )
+        return await asyncio.shield(task)
+
+    def source_details(self) -> dict[str, SourceDetail]:
+        details = {
+            src: SourceDetail(
+                plugin=manifest.name, version=manifest.version, loaded=False
+            )
+            for src, manifest in self.pending.items()
+        }
+        for src, plugin in self.sources.items():
+            capabilities = plugin.capabilities
+            details[src] = SourceDetail(
+                plugin=plugin.name,
+                version=plugin.version,
+                loaded=True,
+                capabilities=[
+                    capability
+                    for capability in (
+                        "auth",
+                        "auto_login",
+                        "reader",
+                        "batch",
+                        "shaper",
+                    )
+                    if getattr(capabilities, capability)
+                ],
+                breaker=plugin.guard.snapshot() if plugin.guard else None,
+            )
+        return details
+
+    def snapshot(self) -> dict[str, Any]:
+        result: dict[str, Any] = {
+            manifest.name: {"loaded": False} for manifest in self.pending.values()
+        }
+        for name, plugin in self.plugins.items():
+            result[name] = {"loaded": True, "load_time": self.load_times.get(name)}
+            if plugin.guard is not None:
+                result[name]["guard"] = plugin.guard.snapshot()
+            if plugin.flights is not None:
+                result[name]["flights"] = plugin.flights.snapshot()
+            if plugin.workers is not None:
+                result[name]["workers"] = plugin.workers.snapshot()
+        return result
 
 
 class PluginUtils:
@@ -145,8 +500,9 @@ class PluginUtils:
                 raise ValueError("Invalid cookies format")
 
             return {
-                src: plugin_cookies.get(src, {})
-                for src in plugin_manager.registered_source
+                src: cookies
+                for src, cookies in plugin_cookies.items()
+                if plugin_manager.is_registered(src)
             }
         except (json.JSONDecodeError, ValueError) as e:
             logger.warning(f"Failed to load cookies: {e}")
@@ -159,3 +515,4 @@ class PluginUtils:
 
 
 plugin_manager = PluginManager()
+metrics.register("plugins", plugin_manager.snapshot)
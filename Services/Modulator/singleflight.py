@@ -0,0 +1,67 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from Models.user import UserData
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, UserData):
+        # Calls on behalf of a user never share results
+        raise TypeError("User specific argument")
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    hash(value)
+    return value
+
+
+class SingleFlight:
+    """
+    Single Flight
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Coalesces identical concurrent plugin calls: while a call is in flight,
+    the same method with the same normalized arguments waits for its result
+    instead of reaching the upstream again. Only `methods` free of side
+    effects are coalesced, and never calls carrying a user's data.
+    """
+
+    def __init__(self, methods: list[str]) -> None:
+        self.methods = set(methods)
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: dict[Hashable, asyncio.Task[Any]] = {}
+
+    def key(self, method: str, args: tuple, kwargs: dict[str, Any]) -> Hashable | None:
+        if method not in self.methods:
+            return None
+        try:
+            return method, _freeze(args), _freeze(kwargs)
+        except TypeError:
+            return None
+
+    @staticmethod
+    def _settle(task: asyncio.Task[Any]) -> None:
+        # Nobody may be left waiting, mark the exception as retrieved
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        if (task := self._flights.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            # Run apart from the first caller, so its cancellation doesn't fail the rest
+            task = self._flights[key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+            task.add_done_callback(self._settle)
+        return await asyncio.shield(task)
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
@@ -0,0 +1,381 @@
+import asyncio
+import importlib
+import inspect
+import io
+import logging
+import os
+import pickle
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import count
+from pathlib import Path
+from typing import IO, Any
+
+from fastapi import HTTPException
+
+from Models.plugins import BasePlugin, IAuth, IBatch, IReader, IShaper
+from Models.user import UserData
+
+logger = logging.getLogger("[CNM]")
+
+# Every frame is a 4-byte big-endian length and an 8-byte request id, followed
+# by a pickled tuple:
+#   request  (method, args, kwargs)
+#   reply    (ok, result or failure, updated UserData cookies)
+# The worker's first reply, with request id 0, reports how loading went.
+# Failures travel as plain data, see `_failure`.
+HEADER = struct.Struct("!IQ")
+
+
+class _Unpickler(pickle.Unpickler):
+    def find_class(self, module: str, name: str) -> Any:
+        # Importing the plugin here would load it into the API process
+        if module.split(".", 1)[0] == "Plugins":
+            raise pickle.UnpicklingError(f"Plugin defined type {module}.{name}")
+        return super().find_class(module, name)
+
+
+def _encode(request_id: int, message: tuple) -> bytes:
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    return HEADER.pack(len(data), request_id) + data
+
+
+def _decode(data: bytes) -> Any:
+    return _Unpickler(io.BytesIO(data)).load()
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    size, request_id = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return request_id, await reader.readexactly(size)
+
+
+def _failure(e: BaseException) -> dict[str, Any]:
+    if isinstance(e, HTTPException):
+        return {
+            "type": type(e).__name__,
+            "status_code": e.status_code,
+            "detail": e.detail,
+        }
+    return {"type": type(e).__name__, "status_code": None, "detail": str(e)}
+
+
+def _rebuild(failure: dict[str, Any]) -> Exception:
+    if failure["status_code"] is not None:
+        return HTTPException(
+            status_code=failure["status_code"], detail=failure["detail"]
+        )
+    return RuntimeError(f"{failure['type']}: {failure['detail']}")
+
+
+def _user_data_updates(
+    args: tuple, kwargs: dict[str, Any]
+) -> dict[int | str, dict[str, dict[str, str]] | None]:
+    # Plugins store upstream cookies on the UserData they are given, which
+    # lives in the API process, so send them back along with the result
+    return {
+        key: arg.plugin_cookies
+        for key, arg in [*enumerate(args), *kwargs.items()]
+        if isinstance(arg, UserData)
+    }
+
+
+class WorkerProcess:
+    """
+    Plugin Worker Process
+    ~~~~~~~~~~~~~~~~~~~~~~
+    A subprocess hosting one instance of a plugin. Calls are multiplexed over
+    its stdin and stdout by request id, so any number of them can be in
+    flight at once. If the process dies, its pending calls fail and it is
+    started again with an increasing delay.
+    """
+
+    def __init__(self, plugin_dir: Path, threads: int) -> None:
+        self.plugin_dir = plugin_dir
+        self.threads = threads
+        self.ready = False
+        self.restarts = 0
+        self.info: dict[str, Any] = {}
+        self._process: asyncio.subprocess.Process | None = None
+        self._pending: dict[int, asyncio.Future[tuple[Any, dict]]] = {}
+        self._ids = count(1)
+        self._supervisor: asyncio.Task[None] | None = None
+        self._closing = False
+
+    @property
+    def active(self) -> int:
+        return len(self._pending)
+
+    async def _spawn(self) -> None:
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "Services.Modulator.worker",
+            self.plugin_dir.name,
+            str(self.threads),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        assert self._process.stdout is not None
+        try:
+            _, frame = await _read_frame(self._process.stdout)
+            ok, info, _ = _decode(frame)
+        except asyncio.IncompleteReadError:
+            ok, info = False, "worker exited while loading"
+        except (pickle.UnpicklingError, ValueError, TypeError) as e:
+            ok, info = False, f"unreadable handshake: {e!r}"
+        if not ok:
+            await self._kill()
+            raise RuntimeError(f"Failed to start plugin {self.plugin_dir.name}: {info}")
+        self.info = info
+        self.ready = True
+
+    async def start(self) -> dict[str, Any]:
+        await self._spawn()
+        self._supervisor = asyncio.create_task(self._supervise())
+        return self.info
+
+    async def _read_replies(self) -> None:
+        assert self._process is not None and self._process.stdout is not None
+        while True:
+            try:
+                request_id, frame = await _read_frame(self._process.stdout)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            except Exception as e:
+                logger.error(f"Lost the worker of plugin {self.plugin_dir.name}: {e!r}")
+                return
+            if (future := self._pending.pop(request_id, None)) is None or future.done():
+                continue
+            try:
+                ok, payload, updates = _decode(frame)
+            except Exception as e:
+                # Only this call is lost, the stream itself is still in sync
+                future.set_exception(
+                    RuntimeError(f"Unreadable reply from plugin worker: {e!r}")
+                )
+                continue
+            if ok:
+                future.set_result((payload, updates))
+            else:
+                future.set_exception(_rebuild(payload))
+
+    async def _supervise(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                await self._read_replies()
+            finally:
+                self.ready = False
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(RuntimeError("Plugin worker exited"))
+                self._pending.clear()
+            await self._kill()
+            if self._closing:
+                return
+
+            while not self._closing:
+                logger.warning(
+                    f"Worker of plugin {self.plugin_dir.name} exited, restarting in {delay:.0f}s"
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60.0)
+                try:
+                    await self._spawn()
+                    self.restarts += 1
+                    delay = 1.0
+                    break
+                except Exception as e:
+                    logger.error(f"Failed to restart worker: {e}")
+            if self._closing:
+                return
+
+    async def call(self, method: str, args: tuple, kwargs: dict[str, Any]) -> Any:
+        if not self.ready or self._process is None or self._process.stdin is None:
+            raise RuntimeError("Plugin worker is restarting")
+        request_id = next(self._ids)
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            self._process.stdin.write(_encode(request_id, (method, args, kwargs)))
+            await self._process.stdin.drain()
+            result, updates = await future
+        finally:
+            self._pending.pop(request_id, None)
+
+        for key, cookies in (updates or {}).items():
+            target = args[key] if isinstance(key, int) else kwargs[key]
+            target.plugin_cookies = cookies
+        return result
+
+    async def _kill(self) -> None:
+        if self._process is None:
+            return
+        if self._process.returncode is None:
+            self._process.kill()
+        await self._process.wait()
+
+    async def close(self, timeout: float = 5.0) -> None:
+        self._closing = True
+        self.ready = False
+        if self._process is not None and self._process.stdin is not None:
+            # EOF on stdin asks the worker to exit
+            self._process.stdin.close()
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._process.wait()
+            except TimeoutError:
+                pass
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+        await self._kill()
+
+
+class WorkerPool:
+    """
+    Plugin Worker Pool
+    ~~~~~~~~~~~~~~~~~~~~~~
+    The worker processes of a plugin. Each call goes to the ready worker with
+    the fewest calls in flight.
+    """
+
+    def __init__(self, plugin_dir: Path, processes: int, threads: int) -> None:
+        self.workers = [WorkerProcess(plugin_dir, threads) for _ in range(processes)]
+
+    async def start(self) -> dict[str, Any]:
+        try:
+            infos = await asyncio.gather(*(worker.start() for worker in self.workers))
+        except BaseException:
+            await self.close()
+            raise
+        return infos[0]
+
+    async def call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        if not (ready := [worker for worker in self.workers if worker.ready]):
+            raise RuntimeError("Plugin workers are restarting")
+        worker = min(ready, key=lambda worker: worker.active)
+        return await worker.call(method, args, kwargs)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(worker.close() for worker in self.workers))
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "processes": len(self.workers),
+            "ready": sum(worker.ready for worker in self.workers),
+            "in_flight": sum(worker.active for worker in self.workers),
+            "restarts": sum(worker.restarts for worker in self.workers),
+        }
+
+
+class RemoteInstance:
+    """Stands in for a plugin instance, its methods are called in the workers."""
+
+    def __init__(self, pool: WorkerPool, methods: list[str], auto_login: bool) -> None:
+        self._pool = pool
+        self._methods = set(methods)
+        self.auto_login = auto_login
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_") or name not in self._methods:
+            raise AttributeError(name)
+        return partial(self._pool.call, name)
+
+
+def send(ipc: IO[bytes], request_id: int, message: tuple) -> None:
+    ipc.write(_encode(request_id, message))
+    ipc.flush()
+
+
+async def _serve(plugin_name: str, threads: int, ipc: IO[bytes]) -> None:
+    loop = asyncio.get_running_loop()
+    try:
+        module = importlib.import_module(f"Plugins.{plugin_name}.main")
+        if not issubclass(entry := getattr(module, plugin_name), BasePlugin):
+            raise TypeError(f"{plugin_name} is not a valid plugin")
+        instance = entry()
+        if not instance.on_load():
+            raise RuntimeError("on_load() failed")
+    except Exception as e:
+        send(ipc, 0, (False, repr(e), None))
+        return
+
+    send(
+        ipc,
+        0,
+        (
+            True,
+            {
+                "methods": [
+                    name
+                    for name in dir(instance)
+                    if not name.startswith("_") and callable(getattr(instance, name))
+                ],
+                "auth": isinstance(instance, IAuth),
+                "auto_login": bool(getattr(instance, "auto_login", False)),
+                "reader": isinstance(instance, IReader),
+                "batch": isinstance(instance, IBatch),
+                "shaper": isinstance(instance, IShaper),
+            },
+            None,
+        ),
+    )
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), sys.stdin.buffer
+    )
+
+    async def handle(request_id: int, frame: bytes) -> None:
+        try:
+            method, args, kwargs = pickle.loads(frame)
+            func = getattr(instance, method)
+            if inspect.iscoroutinefunction(func):
+                result = await func(*args, **kwargs)
+            else:
+                result = await loop.run_in_executor(
+                    executor, partial(func, *args, **kwargs)
+                )
+            reply = (True, result, _user_data_updates(args, kwargs))
+            frame = _encode(request_id, reply)
+        except Exception as e:
+            frame = _encode(request_id, (False, _failure(e), None))
+        try:
+            ipc.write(frame)
+            ipc.flush()
+        except BrokenPipeError:
+            # The API process is gone, stdin reaching EOF ends the worker
+            pass
+
+    tasks: set[asyncio.Task[None]] = set()
+    while True:
+        try:
+            request_id, frame = await _read_frame(reader)
+        except asyncio.IncompleteReadError:
+            break
+        task = asyncio.create_task(handle(request_id, frame))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    for task in tasks:
+        task.cancel()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main() -> None:
+    plugin_name, threads = sys.argv[1], int(sys.argv[2])
+    # Keep the real stdout for replies and send anything the plugin prints to stderr
+    ipc = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - %(name)s [{plugin_name}:%(process)d] [%(levelname)s] : %(message)s",
+        datefmt="[%X]",
+    )
+    asyncio.run(_serve(plugin_name, threads, ipc))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+import bcrypt
+from fastapi import HTTPException
+
+from Services.Config.config import config
+from Services.Metrics.metrics import metrics
+
+logger = logging.getLogger("[Security]")
+
+
+class PasswordHasher:
+    """
+    Password Hasher
+    ~~~~~~~~~~~~~~~~~~~~~~
+    Runs bcrypt on a dedicated, bounded thread pool (bcrypt releases the GIL)
+    so hashing never blocks the event loop. Once `max_pending` operations are
+    queued, new ones are rejected instead of piling up behind the others.
+    """
+
+    def __init__(self, rounds: int, max_workers: int, max_pending: int) -> None:
+        self.rounds = rounds
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bcrypt"
+        )
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning("Password hashing queue is full, rejecting request")
+            raise HTTPException(status_code=503, detail="Server busy, try again later")
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, partial(func, *args)
+            )
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(
+            bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds)
+        )
+        return hashed.decode("utf-8")
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(
+            bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8")
+        )
+
+    def needs_rehash(self, hashed: str) -> bool:
+        # bcrypt hashes look like $2b$<rounds>$<salt+digest>
+        try:
+            return int(hashed.split("$")[2]) < self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def snapshot(self) -> dict[str, int]:
+        return {
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(
+    rounds=config.security.bcrypt_rounds,
+    max_workers=config.security.hash_workers or os.cpu_count() or 1,
+    max_pending=config.security.hash_queue,
+)
+metrics.register("password", password_hasher.snapshot)
@@ -8,15 +8,17 @@ from Crypto.Util.Padding import pad, unpad
 from fastapi import Cookie, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jwt import InvalidTokenError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 
 from Models.database import UserDb
 from Models.user import TokenData, User, UserData
+from Services.Cache.user import user_cache
 from Services.Config.config import config
-from Services.Database.database import get_db
+from Services.Database.database import SessionLocal
 from Services.Modulator.manager import PluginUtils
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/user/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/user/login", auto_error=False)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 SECRET_KEY = config.security.secret_key
@@ -33,9 +35,7 @@ def create_access_token(data: TokenData, expires_delta: timedelta | None = None)
     return encoded_jwt
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         uid: str = payload["id"]
@@ -48,19 +48,28 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user: UserDb | None = db.query(UserDb).filter(UserDb.uid == uid).first()
+    if (cached := user_cache.get(uid)) is not None:
+        return cached
+
+    # Only open a session on a cache miss, so most requests never touch the database
+    async with SessionLocal() as db:
+        user: UserDb | None = await db.scalar(
+            select(UserDb).where(UserDb.user_id == uid)
+        )
     if user is None:
         raise HTTPException(
             401,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return User(
-        user_id=user.uid,
+    result = User(
+        user_id=user.user_id,
         email=user.email,
         username=user.username,
         created_at=user.created_at,
     )
+    user_cache.set(uid, result)
+    return result
 
 
 def get_user_data(
@@ -72,6 +81,16 @@ def get_user_data(
     )
 
 
+async def get_optional_user_data(
+    plugin_cookies: Annotated[str | None, Cookie()] = None,
+    token: str | None = Depends(optional_oauth2_scheme),
+) -> UserData | None:
+    """User data of a signed-in caller, None for anonymous requests."""
+    if token is None:
+        return None
+    return get_user_data(plugin_cookies, await get_current_user(token))
+
+
 def encrypt_src_data(key: str, src_data: str) -> str:
     iv = get_random_bytes(AES.block_size)
     cipher = AES.new(pad(key.encode("utf-8"), AES.block_size), AES.MODE_CBC, iv)
@@ -0,0 +1,176 @@
+"""
+Shared cache get/set throughput per backend with several worker processes.
+
+The memory backend is per process, so its workers don't see each other's
+writes, sqlite and redis are shared by every worker. Redis is only measured
+when --redis-url is given, and that database is flushed before each run, so
+point it at a scratch one.
+
+Run from the repository root with a config in place:
+
+    python bench/cache.py --ops 2000 --processes 1 2 4 --writes 0.2
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+
+def create_cache(backend: str, target: str):
+    from aiocache import Cache
+    from aiocache.serializers import JsonSerializer
+
+    from Services.Cache.memory import MemoryBackend
+    from Services.Cache.sqlite import SQLiteCache
+
+    match backend:
+        case "sqlite":
+            return SQLiteCache(path=target, serializer=JsonSerializer())
+        case "redis":
+            redis = Cache.from_url(target)
+            redis.serializer = JsonSerializer()
+            return redis
+        case _:
+            return MemoryBackend(namespace="bench")
+
+
+async def run_worker(
+    backend: str,
+    target: str,
+    worker: int,
+    ops: int,
+    keys: int,
+    writes: float,
+    concurrency: int,
+    fill: bool,
+) -> tuple[list[float], int, int, float]:
+    cache = create_cache(backend, target)
+    rng = random.Random(worker)
+    latencies: list[float] = []
+    hits = reads = 0
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal hits, reads
+        key = f"page:{rng.randrange(keys)}"
+        async with slots:
+            started = time.perf_counter()
+            if rng.random() < writes:
+                await cache.set(key, {"worker": worker, "op": i}, ttl=600)
+            else:
+                reads += 1
+                if await cache.get(key) is not None:
+                    hits += 1
+            latencies.append(time.perf_counter() - started)
+
+    try:
+        if fill:
+            # Fill the cache first so reads hit from the start
+            await cache.multi_set([(f"page:{i}", {"op": i}) for i in range(keys)])
+        if not ops:
+            return [], 0, 0, 0.0
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(ops)))
+        return latencies, hits, reads, time.perf_counter() - started
+    finally:
+        await cache.close()
+
+
+def worker_main(*args) -> tuple[list[float], int, int, float]:
+    return asyncio.run(run_worker(*args))
+
+
+async def clear(backend: str, target: str) -> None:
+    cache = create_cache(backend, target)
+    try:
+        await cache.clear()
+    finally:
+        await cache.close()
+
+
+def measure(
+    args: argparse.Namespace, backend: str, target: str, processes: int
+) -> tuple[float, ...]:
+    """Returns total ops/s, median and p99 latency, and the read hit rate."""
+    shared = backend != "memory"
+    if shared:
+        worker_main(backend, target, -1, 0, args.keys, 0.0, 1, True)
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processes, mp_context=context) as pool:
+        results = list(
+            pool.map(
+                worker_main,
+                [backend] * processes,
+                [target] * processes,
+                range(processes),
+                [args.ops] * processes,
+                [args.keys] * processes,
+                [args.writes] * processes,
+                [args.concurrency] * processes,
+                [not shared] * processes,
+            )
+        )
+
+    # Time spent spawning the processes is left out
+    elapsed = max(result[3] for result in results)
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    hits = sum(result[1] for result in results)
+    reads = sum(result[2] for result in results)
+    return (
+        len(latencies) / elapsed,
+        statistics.median(latencies),
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        hits / reads if reads else 0.0,
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    print(
+        f"{args.ops} ops per process over {args.keys} keys, "
+        f"{args.writes:.0%} writes, {args.concurrency} in flight per process"
+    )
+    print(
+        f"{'backend':<8} {'processes':>9} {'ops/s':>10} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'hit rate':>9}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {"memory": "", "sqlite": ""}
+        if args.redis_url:
+            backends["redis"] = args.redis_url
+        for backend, target in backends.items():
+            for processes in args.processes:
+                if backend == "sqlite":
+                    # A fresh file per run, so earlier runs don't warm it up
+                    target = Path(tmp, f"cache-{processes}.db").as_posix()
+                elif backend == "redis":
+                    asyncio.run(clear(backend, target))
+                rate, p50, p99, hit_rate = measure(args, backend, target, processes)
+                print(
+                    f"{backend:<8} {processes:>9} {rate:>10.1f} "
+                    f"{p50 * 1000:>8.2f} {p99 * 1000:>8.2f} {hit_rate:>9.1%}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--writes", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--redis-url", help="e.g. redis://127.0.0.1:6379/15")
+    main(parser.parse_args())
@@ -0,0 +1,148 @@
+"""
+/comic request latency during a burst of password hashes, inline against the pool.
+
+Logins hash concurrently while a steady stream of GET /comic/suggest requests
+goes through the real app in the same event loop, with the rate limiter off
+and authentication stubbed out.
+
+Run from the repository root with a config in place:
+
+    python bench/hashing.py --requests 64 --concurrency 1 8 32 --rounds 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+
+async def inline_hash(password: str, rounds: int) -> str:
+    """Hashing on the event loop, as the routes did before the hasher pool."""
+    import bcrypt
+
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode()
+
+
+def percentiles(latencies: list[float]) -> tuple[float, float]:
+    latencies = sorted(latencies)
+    return (
+        statistics.median(latencies),
+        latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    )
+
+
+async def comic_traffic(client, latencies: list[float], interval: float) -> None:
+    """Send /comic/suggest requests at a steady rate, each on its own task."""
+
+    async def one() -> None:
+        started = time.perf_counter()
+        response = await client.get("/comic/suggest", params={"q": "bench"})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+    tasks: set[asyncio.Task[None]] = set()
+    try:
+        while True:
+            task = asyncio.create_task(one())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            await asyncio.sleep(interval)
+    finally:
+        # Requests already sent still count
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def measure(
+    client, hash_func, requests: int, concurrency: int, interval: float
+) -> tuple[float, ...]:
+    """Returns hashes/s, then p50 and p99 of the logins and of the /comic requests."""
+    logins: list[float] = []
+    comics: list[float] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def login(i: int) -> None:
+        async with slots:
+            started = time.perf_counter()
+            await hash_func(f"password-{i}")
+            logins.append(time.perf_counter() - started)
+
+    traffic = asyncio.create_task(comic_traffic(client, comics, interval))
+    # Let the traffic start before anything can block the loop
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    traffic.cancel()
+    await asyncio.gather(traffic, return_exceptions=True)
+
+    return requests / elapsed, *percentiles(logins), *percentiles(comics)
+
+
+async def main(args: argparse.Namespace) -> None:
+    import httpx
+
+    from main import app
+    from Models.user import User
+    from Services.Limiter.limiter import freq_limiter
+    from Services.Security.password import PasswordHasher
+    from Services.Security.user import get_current_user
+
+    freq_limiter.enabled = False
+    app.dependency_overrides[get_current_user] = lambda: User(
+        user_id="bench",
+        email="bench@example.com",
+        username="bench",
+        created_at=datetime.now(),
+    )
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    )
+
+    workers = args.workers or os.cpu_count() or 1
+    hasher = PasswordHasher(args.rounds, workers, max_pending=args.requests)
+    backends = {
+        "inline": lambda password: inline_hash(password, args.rounds),
+        f"pool({workers})": hasher.hash,
+    }
+
+    print(
+        f"{args.requests} hashes at cost {args.rounds}, "
+        f"a /comic request every {args.interval} ms"
+    )
+    print(
+        f"{'backend':<12} {'concurrency':>11} {'hashes/s':>10} {'login p50':>10} "
+        f"{'login p99':>10} {'comic p50':>10} {'comic p99':>10}"
+    )
+    try:
+        for name, hash_func in backends.items():
+            for concurrency in args.concurrency:
+                rate, *latencies = await measure(
+                    client, hash_func, args.requests, concurrency, args.interval / 1000
+                )
+                print(
+                    f"{name:<12} {concurrency:>11} {rate:>10.1f} "
+                    + " ".join(f"{latency * 1000:>10.1f}" for latency in latencies)
+                )
+    finally:
+        hasher.shutdown()
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument(
+        "--interval", type=float, default=5.0, help="ms between /comic requests"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+"""
+Per-request overhead of the upload size limiter.
+
+Requests are sent straight to the ASGI app, without a server, so only the
+middleware stack is measured. Run from the repository root with a config in
+place:
+
+    python bench/limiter.py --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+
+def build_app(middleware: type | None, **options):
+    from fastapi import FastAPI, Request
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping() -> str:
+        return "pong"
+
+    @app.post("/upload")
+    async def upload(request: Request) -> int:
+        return len(await request.body())
+
+    if middleware is not None:
+        app.add_middleware(middleware, **options)
+    return app
+
+
+async def measure(app, method: str, path: str, body: bytes, requests: int) -> float:
+    """Microseconds per request."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-length", str(len(body)).encode())] if body else [],
+        "server": ("bench", 80),
+        "client": ("127.0.0.1", 1),
+    }
+    # Split the body like a server receiving it in chunks
+    chunks = [body[i : i + 65536] for i in range(0, len(body), 65536)] or [b""]
+
+    async def send(message) -> None:
+        pass
+
+    async def once() -> None:
+        messages = iter(enumerate(chunks, 1))
+
+        async def receive():
+            if (message := next(messages, None)) is None:
+                return {"type": "http.disconnect"}
+            index, chunk = message
+            return {
+                "type": "http.request",
+                "body": chunk,
+                "more_body": index < len(chunks),
+            }
+
+        await app(dict(scope), receive, send)
+
+    await once()
+    started = time.perf_counter()
+    for _ in range(requests):
+        await once()
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def main(args: argparse.Namespace) -> None:
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    from Services.Limiter.limiter import LimitUploadSize
+
+    class Passthrough(BaseHTTPMiddleware):
+        # What the limiter cost as a BaseHTTPMiddleware doing nothing else
+        async def dispatch(self, request, call_next):
+            return await call_next(request)
+
+    apps = {
+        "none": build_app(None),
+        "BaseHTTPMiddleware": build_app(Passthrough),
+        "LimitUploadSize": build_app(
+            LimitUploadSize, max_upload_size=args.body * 2, route_limits={"/user/": 1}
+        ),
+    }
+    body = os.urandom(args.body)
+    print(f"{args.requests} requests, {args.body // 1024} KiB upload body")
+    print(f"{'middleware':<20} {'GET us':>10} {'POST us':>10}")
+    for name, app in apps.items():
+        get = await measure(app, "GET", "/ping", b"", args.requests)
+        post = await measure(app, "POST", "/upload", body, args.requests)
+        print(f"{name:<20} {get:>10.1f} {post:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--body", type=int, default=256 * 1024)
+    asyncio.run(main(parser.parse_args()))
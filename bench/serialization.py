@@ -0,0 +1,86 @@
+"""
+StandardResponse encoding time against the previous dump-then-JSONResponse path.
+
+Run from the repository root with a config in place:
+
+    python bench/serialization.py --items 0 20 500 --repeat 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+
+def search_result(items: int) -> Any:
+    from Models.comic import BaseComicInfo, ComicSearchResult, SourceStatus
+
+    return ComicSearchResult(
+        comics=[
+            BaseComicInfo(
+                author=[f"author {i}", "co-author"],
+                cover=f"https://example.com/covers/{i}.webp",
+                id=str(i),
+                name=f"Comic number {i}",
+            )
+            for i in range(items)
+        ],
+        sources={
+            "alpha": SourceStatus(status="ok", count=items),
+            "beta": SourceStatus(status="timeout", message="Timed out"),
+        },
+        next_cursor="cursor",
+    )
+
+
+def timed(build, repeat: int) -> float:
+    """Mean microseconds spent building a response."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        build()
+    return (time.perf_counter() - started) / repeat * 1_000_000
+
+
+def main(args: argparse.Namespace) -> None:
+    from fastapi.responses import JSONResponse
+
+    from Models.response import BaseResponse, StandardResponse
+
+    def before(data: Any) -> JSONResponse:
+        # Validate the envelope, dump it to a dict, then encode that with json
+        return JSONResponse(
+            content=BaseResponse[Any](
+                status_code=200, message="ok", data=data
+            ).model_dump(mode="json")
+        )
+
+    def after(data: Any) -> StandardResponse:
+        return StandardResponse(status_code=200, message="ok", data=data)
+
+    print(f"{args.repeat} responses per payload")
+    print(
+        f"{'payload':<16} {'bytes':>8} {'before us':>10} {'after us':>9} {'speedup':>8}"
+    )
+    for items in args.items:
+        data = search_result(items)
+        if before(data).body != after(data).body:
+            raise RuntimeError(f"Bodies differ for {items} items")
+        old = timed(lambda: before(data), args.repeat)
+        new = timed(lambda: after(data), args.repeat)
+        print(
+            f"{f'{items} comics':<16} {len(after(data).body):>8} "
+            f"{old:>10.1f} {new:>9.1f} {old / new:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[0, 20, 500])
+    parser.add_argument("--repeat", type=int, default=2000)
+    main(parser.parse_args())
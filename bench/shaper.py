@@ -0,0 +1,127 @@
+"""
+Descrambled pages per second by shaper worker count, reading a chapter in order.
+
+Run from the repository root with a config in place:
+
+    python bench/shaper.py --pages 40 --size 262144 --workers 1 2 4 8 --prefetch 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+PLUGIN = """
+import hashlib
+
+from Models.plugins import BasePlugin, IShaper
+
+
+class BenchShaper(BasePlugin, IShaper):
+    def on_load(self) -> bool:
+        return True
+
+    def on_unload(self) -> None:
+        pass
+
+    def search(self, keyword, page=1, **kwargs):
+        return []
+
+    def album(self, album_id, **kwargs):
+        return None
+
+    @staticmethod
+    def imager_shaper(image: bytes, **kwargs) -> bytes:
+        # Put the image's strips back in order, with some work per strip
+        strips = [image[i : i + 4096] for i in range(0, len(image), 4096)]
+        for strip in strips:
+            digest = strip
+            for _ in range(kwargs["rounds"]):
+                digest = hashlib.sha256(digest).digest()
+        return b"".join(reversed(strips))
+"""
+
+
+async def read_chapter(shaper, plugin, images: list) -> tuple[float, float]:
+    """Request every page in order, as a reader would, returns pages/s and first page latency."""
+    started = time.perf_counter()
+    first = 0.0
+    for page in range(len(images)):
+        if (
+            await shaper.shape(plugin, "bench", "album", "chapter", page, images)
+            is None
+        ):
+            raise RuntimeError(f"Failed to shape page {page}")
+        if page == 0:
+            first = time.perf_counter() - started
+    return len(images) / (time.perf_counter() - started), first
+
+
+async def main(args: argparse.Namespace) -> None:
+    import httpx
+
+    from Models.comic import ComicImage
+    from Models.plugins import Plugin
+    from Services.Image import image
+    from Services.Image.image import ImageStore
+    from Services.Image.shaper import ImageShaper
+
+    page = os.urandom(args.size)
+
+    async def upstream(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(args.latency / 1000)
+        return httpx.Response(200, content=page, headers={"content-type": "image/webp"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    image.http_clients.get = lambda source=None: client  # type: ignore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Plugins is a namespace package, the temporary one is merged with the repository's
+        plugin_dir = Path(tmp, "Plugins", "BenchShaper")
+        plugin_dir.mkdir(parents=True)
+        plugin_dir.joinpath("main.py").write_text(PLUGIN)
+        sys.path.insert(0, tmp)
+        os.environ["PYTHONPATH"] = os.pathsep.join([tmp, str(ROOT)])
+
+        from Plugins.BenchShaper.main import BenchShaper  # type: ignore
+
+        plugin = Plugin("BenchShaper", "1.0.0", "0.3.0", ["bench"], {}, BenchShaper())
+        images = [
+            ComicImage(url=f"http://bench/{i}", shaper={"rounds": args.rounds})
+            for i in range(args.pages)
+        ]
+        print(
+            f"{args.pages} pages of {args.size // 1024} KiB, "
+            f"{args.latency} ms upstream latency"
+        )
+        print(f"{'workers':>7} {'prefetch':>8} {'pages/s':>10} {'first page ms':>14}")
+        for workers in args.workers:
+            for prefetch in sorted({0, args.prefetch}):
+                # A fresh store per run, so no run finds pages shaped by an earlier one
+                store = Path(tmp, f"store-{workers}-{prefetch}").as_posix()
+                shaper = ImageShaper(ImageStore(store, 65536, 30), workers, prefetch)
+                try:
+                    rate, first = await read_chapter(shaper, plugin, images)
+                finally:
+                    shaper.close()
+                print(f"{workers:>7} {prefetch:>8} {rate:>10.1f} {first * 1000:>14.1f}")
+        plugin.shutdown()
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--size", type=int, default=256 * 1024)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=50.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--prefetch", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
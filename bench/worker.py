@@ -0,0 +1,148 @@
+"""
+Plugin call throughput and latency in threads and across worker process counts.
+
+Run from the repository root with a config in place:
+
+    python bench/worker.py --calls 2000 --concurrency 32 --processes 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+PLUGIN = """
+import hashlib
+import time
+
+from Models.comic import BaseComicInfo
+from Models.plugins import BasePlugin
+
+
+class BenchPlugin(BasePlugin):
+    def on_load(self) -> bool:
+        return True
+
+    def on_unload(self) -> None:
+        pass
+
+    def search(self, keyword, **kwargs):
+        time.sleep(0.002)  # Waiting on the upstream site
+        return [
+            BaseComicInfo(id=str(i), name=f"{keyword} {i}", author=["bench"], cover="")
+            for i in range(20)
+        ]
+
+    def album(self, album_id, **kwargs):
+        # Parsing a large page
+        digest = album_id.encode()
+        for _ in range(2000):
+            digest = hashlib.sha256(digest).digest()
+        return digest.hex()
+"""
+
+METHODS = (("search", "bench"), ("album", "album"))
+
+
+async def run(call, method: str, arg: str, calls: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    remaining = iter(range(calls))
+
+    async def client() -> None:
+        for _ in remaining:
+            started = time.perf_counter()
+            await call(method, arg)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "calls/s": calls / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p99 ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    from Models.plugins import Plugin
+    from Services.Modulator.worker import RemoteInstance, WorkerPool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Plugins is a namespace package, the temporary one is merged with the repository's
+        plugin_dir = Path(tmp, "Plugins", "BenchPlugin")
+        plugin_dir.mkdir(parents=True)
+        plugin_dir.joinpath("main.py").write_text(PLUGIN)
+        sys.path.insert(0, tmp)
+        os.environ["PYTHONPATH"] = os.pathsep.join([tmp, str(ROOT)])
+
+        from Plugins.BenchPlugin.main import BenchPlugin  # type: ignore
+
+        threaded = Plugin(
+            "BenchPlugin", "1.0.0", "0.3.0", ["bench"], {}, BenchPlugin(), args.threads
+        )
+
+        print(
+            f"{args.calls} calls, {args.concurrency} concurrent, "
+            f"{args.threads} threads per plugin or worker"
+        )
+        print(
+            f"{'method':<8} {'isolation':<10} {'processes':>9} "
+            f"{'calls/s':>10} {'p50 ms':>8} {'p99 ms':>8}"
+        )
+
+        def report(method: str, name: str, processes: str, result: dict) -> None:
+            print(
+                f"{method:<8} {name:<10} {processes:>9} {result['calls/s']:>10.0f} "
+                f"{result['p50 ms']:>8.2f} {result['p99 ms']:>8.2f}"
+            )
+
+        try:
+            for method, arg in METHODS:
+                result = await run(
+                    threaded.call, method, arg, args.calls, args.concurrency
+                )
+                report(method, "thread", "-", result)
+        finally:
+            threaded.shutdown()
+
+        for processes in args.processes:
+            pool = WorkerPool(plugin_dir, processes, args.threads)
+            info = await pool.start()
+            isolated = Plugin(
+                "BenchPlugin",
+                "1.0.0",
+                "0.3.0",
+                ["bench"],
+                {},
+                RemoteInstance(pool, info["methods"], False),  # type: ignore
+                args.threads,
+                workers=pool,
+                interfaces=info,
+            )
+            try:
+                for method, arg in METHODS:
+                    result = await run(
+                        isolated.call, method, arg, args.calls, args.concurrency
+                    )
+                    report(method, "process", str(processes), result)
+            finally:
+                await isolated.unload()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    asyncio.run(main(parser.parse_args()))
@@ -12,15 +12,22 @@ from slowapi.errors import RateLimitExceeded
 
 from Models.response import http_exception_handler, validation_exception_handler
 from Routers.comic import comic_router
+from Routers.core import core_router
 from Routers.user import user_router
+from Services.Cache.cache import cache
 from Services.Config.config import config
 from Services.Database.database import Base, engine
+from Services.Http.http import http_clients
+from Services.Image.shaper import image_shaper
+from Services.Index.index import comic_index
 from Services.Limiter.limiter import (
     LimitUploadSize,
     RateLimitExceeded_handler,
     freq_limiter,
 )
+from Services.Mail.mail import mail_queue
 from Services.Modulator.manager import plugin_manager
+from Services.Security.password import password_hasher
 
 logging.basicConfig(
     level=config.log.log_level,
@@ -39,10 +46,22 @@ logging.getLogger("httpcore").setLevel(logging.WARNING)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(engine, checkfirst=True)
-    plugin_manager.load_plugins()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, checkfirst=True)
+    await plugin_manager.load_plugins()
+    await comic_index.start()
+    plugin_manager.start_watcher()
+    mail_queue.start()
     yield
-    plugin_manager.unload_plugins()
+    await mail_queue.stop()
+    plugin_manager.stop_watcher()
+    await plugin_manager.unload_plugins()
+    image_shaper.close()
+    password_hasher.shutdown()
+    await http_clients.close()
+    await comic_index.close()
+    await engine.dispose()
+    await cache.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -60,8 +79,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(LimitUploadSize, max_upload_size=1024 * 1024 * 25)  # ~25MB
+app.add_middleware(
+    LimitUploadSize,
+    max_upload_size=config.limiter.max_upload_size,
+    route_limits=config.limiter.upload_limits,
+)
 
+app.include_router(core_router)
 app.include_router(user_router)
 app.include_router(comic_router)
 
@@ -0,0 +1,44 @@
+import pytest
+
+from Models.comic import ComicInfo
+from Services.Cache.album import AlbumCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def album(**fields) -> ComicInfo:
+    return ComicInfo(
+        id="1", name="Album", cover="", author=["someone"], **fields  # type: ignore
+    )
+
+
+async def test_miss_and_hit_agree_on_user_fields():
+    albums = AlbumCache(ttl=60, stale_ttl=60)
+    calls = 0
+
+    async def fetch() -> ComicInfo:
+        nonlocal calls
+        calls += 1
+        return album(is_favorite=True, is_viewed=True)
+
+    miss = await albums.get("test-album", "1", fetch)
+    hit = await albums.get("test-album", "1", fetch)
+
+    assert calls == 1
+    assert miss == hit
+    assert miss.is_favorite is None and miss.is_viewed is None
+
+
+def test_personalize_only_takes_user_fields():
+    shared = album(views=10)
+    personal = AlbumCache.personalize(shared, {"is_favorite": True, "views": 0})
+
+    assert personal.is_favorite is True
+    assert personal.views == 10
+    assert shared.is_favorite is None
+    assert AlbumCache.personalize(shared, None) is shared
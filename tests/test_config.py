@@ -0,0 +1,29 @@
+import pytest
+from pydantic import ValidationError
+
+from Services.Config.config import LimiterConfig
+
+
+@pytest.mark.parametrize(
+    "storage_uri, strategy",
+    [
+        ("memory://", "moving-window"),
+        ("redis://127.0.0.1:6379/1", "moving-window"),
+        ("memcached://127.0.0.1:11211", "sliding-window-counter"),
+        ("memcached://127.0.0.1:11211", "fixed-window"),
+    ],
+)
+def test_limiter_accepts_supported_strategy(storage_uri: str, strategy: str):
+    LimiterConfig(storage_uri=storage_uri, strategy=strategy)  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "storage_uri, strategy",
+    [
+        ("memcached://127.0.0.1:11211", "moving-window"),
+        ("sqlite:///cache.db", "fixed-window"),
+    ],
+)
+def test_limiter_rejects_unsupported_strategy(storage_uri: str, strategy: str):
+    with pytest.raises(ValidationError):
+        LimiterConfig(storage_uri=storage_uri, strategy=strategy)  # type: ignore
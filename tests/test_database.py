@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from Services.Database import database
+from Services.Database.database import PoolStats, get_db
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def engine(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(
+        database,
+        "SessionLocal",
+        async_sessionmaker(bind=engine, expire_on_commit=False),
+    )
+    monkeypatch.setattr(database, "pool_stats", PoolStats())
+    yield engine
+    await engine.dispose()
+
+
+async def test_get_db_checks_out_a_connection(engine):
+    sessions = get_db()
+    session = await anext(sessions)
+    try:
+        assert (await session.execute(text("SELECT 1"))).scalar() == 1
+        assert database.pool_stats.snapshot()["in_use"] == 1
+    finally:
+        await sessions.aclose()
+
+    snapshot = database.pool_stats.snapshot()
+    assert snapshot["checkouts"] == 1
+    assert snapshot["in_use"] == 0
+    assert snapshot["idle"] == 1
+    assert snapshot["max_wait"] >= snapshot["avg_wait"] >= 0
+
+
+async def test_pool_stats_average_the_waits(engine):
+    for _ in range(3):
+        sessions = get_db()
+        await anext(sessions)
+        await sessions.aclose()
+
+    snapshot = database.pool_stats.snapshot()
+    stats = database.pool_stats
+    assert snapshot["checkouts"] == 3
+    assert snapshot["avg_wait"] == pytest.approx(stats.total_wait / 3)
+    assert snapshot["max_wait"] == stats.max_wait
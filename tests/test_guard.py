@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from Services.Config.config import PluginPolicy
+from Services.Modulator.guard import (
+    CallGuard,
+    SourceOverloaded,
+    SourceTimeout,
+    SourceUnavailable,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def guard(**policy) -> CallGuard:
+    return CallGuard("test", PluginPolicy(**policy))
+
+
+async def ok() -> str:
+    return "ok"
+
+
+async def broken() -> None:
+    raise RuntimeError("upstream is down")
+
+
+async def test_circuit_opens_after_consecutive_failures():
+    calls = guard(failure_threshold=2, recovery_time=60)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await calls.run(broken)
+
+    assert calls.state == "open"
+    with pytest.raises(SourceUnavailable):
+        await calls.run(ok)
+    assert calls.rejected == 1
+
+
+async def test_probe_closes_or_reopens_the_circuit():
+    calls = guard(failure_threshold=1, recovery_time=0.05)
+    with pytest.raises(RuntimeError):
+        await calls.run(broken)
+
+    await asyncio.sleep(0.06)
+    with pytest.raises(RuntimeError):
+        await calls.run(broken)
+    assert calls.state == "open"
+
+    await asyncio.sleep(0.06)
+    assert await calls.run(ok) == "ok"
+    assert calls.state == "closed" and calls.failures == 0
+
+
+async def test_only_one_probe_at_a_time():
+    calls = guard(failure_threshold=1, recovery_time=0.05)
+    with pytest.raises(RuntimeError):
+        await calls.run(broken)
+    await asyncio.sleep(0.06)
+
+    release = asyncio.Event()
+
+    async def slow() -> str:
+        await release.wait()
+        return "ok"
+
+    probe = asyncio.create_task(calls.run(slow))
+    await asyncio.sleep(0)
+    with pytest.raises(SourceUnavailable):
+        await calls.run(ok)
+    release.set()
+    assert await probe == "ok"
+
+
+async def test_client_errors_dont_count_as_failures():
+    calls = guard(failure_threshold=1)
+
+    async def not_found() -> None:
+        raise HTTPException(status_code=404, detail="No such album")
+
+    with pytest.raises(HTTPException):
+        await calls.run(not_found)
+    assert calls.state == "closed" and calls.errors == 0
+
+
+async def test_timeout_counts_as_failure():
+    calls = guard(call_timeout=0.05, failure_threshold=1)
+
+    async def hang() -> None:
+        await asyncio.sleep(10)
+
+    with pytest.raises(SourceTimeout):
+        await calls.run(hang)
+    assert calls.timeouts == 1
+    assert calls.state == "open"
+
+
+async def test_bulkhead_turns_away_overload_without_opening():
+    calls = guard(max_concurrency=1, queue_timeout=0.05, failure_threshold=1)
+    release = asyncio.Event()
+
+    async def busy() -> str:
+        await release.wait()
+        return "ok"
+
+    first = asyncio.create_task(calls.run(busy))
+    await asyncio.sleep(0)
+    with pytest.raises(SourceOverloaded):
+        await calls.run(ok)
+    assert calls.overloaded == 1
+    assert calls.state == "closed" and calls.failures == 0
+
+    release.set()
+    assert await first == "ok"
+    assert calls.active == 0
+    assert await calls.run(ok) == "ok"
@@ -0,0 +1,52 @@
+from Services.Index.segment import (
+    DiskSegment,
+    MemorySegment,
+    tokenize,
+    write_segment,
+)
+
+
+def test_tokenize_words_and_cjk_bigrams():
+    assert tokenize("One-Piece, VOL.2") == ["one", "piece", "vol", "2"]
+    assert tokenize("ＡＢＣ") == ["abc"]
+    assert tokenize("进击的巨人") == ["进击", "击的", "的巨", "巨人"]
+    assert tokenize("火 Fire王") == ["火", "fire", "王"]
+    assert tokenize("  __ ") == []
+
+
+def doc(i: int, name: str) -> dict:
+    return {"source": "s", "id": str(i), "name": name, "author": ["Author"], "tags": []}
+
+
+def test_memory_segment_prefixes_stay_sorted():
+    segment = MemorySegment()
+    segment.add("s\x000", doc(0, "banana"))
+    segment.add("s\x001", doc(1, "band apple"))
+    assert [term for term, _ in segment.prefixed("ban")] == ["banana", "band"]
+
+    segment.add("s\x002", doc(2, "bandit"))
+    assert [term for term, _ in segment.prefixed("band")] == ["band", "bandit"]
+    assert list(segment.lookup("apple")) == [1]
+
+
+def test_disk_segment_round_trip(tmp_path):
+    memory = MemorySegment()
+    for i, name in enumerate(["One Piece", "Piece of Cake", "进击的巨人"]):
+        memory.add(f"s\x00{i}", doc(i, name))
+    path = tmp_path / "00-00000001.seg"
+    write_segment(path, memory.keys, memory.docs, memory.postings)
+
+    segment = DiskSegment(path)
+    try:
+        assert segment.keys == memory.keys
+        assert [segment.doc(i) for i in range(len(segment))] == memory.docs
+        assert list(segment.lookup("piece")) == [0, 1]
+        assert list(segment.lookup("巨人")) == [2]
+        assert list(segment.lookup("missing")) == []
+        assert list(segment.prefixed("p")) == list(memory.prefixed("p"))
+        assert [term for term, _ in segment.prefixed("进")] == ["进击"]
+        postings = segment.lookup("author")
+    finally:
+        segment.close()
+    # Postings are copied out, they outlive the segment's memory map
+    assert list(postings) == [0, 1, 2]
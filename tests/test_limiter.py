@@ -0,0 +1,84 @@
+import ipaddress
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from starlette.requests import Request as StarletteRequest
+
+from Models.response import http_exception_handler
+from Services.Limiter import limiter
+from Services.Limiter.limiter import LimitUploadSize, get_client_address
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    app = FastAPI()
+    app.add_exception_handler(HTTPException, http_exception_handler)  # type: ignore
+    app.add_middleware(
+        LimitUploadSize, max_upload_size=16, route_limits={"/large/": 64}
+    )
+
+    @app.post("/upload")
+    @app.post("/large/upload")
+    async def upload(request: Request) -> dict[str, int]:
+        return {"size": len(await request.body())}
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
+
+
+async def chunks(size: int):
+    for _ in range(size // 4):
+        yield b"data"
+
+
+async def test_declared_length_over_the_limit(client):
+    response = await client.post("/upload", content=b"x" * 17)
+    assert response.status_code == 413
+    assert (await client.post("/upload", content=b"x" * 16)).json() == {"size": 16}
+
+
+async def test_chunked_body_over_the_limit(client):
+    response = await client.post("/upload", content=chunks(20))
+    assert "content-length" not in response.request.headers
+    assert response.status_code == 413
+    assert (await client.post("/upload", content=chunks(16))).json() == {"size": 16}
+
+
+async def test_route_limits(client):
+    assert (await client.post("/large/upload", content=chunks(64))).status_code == 200
+    assert (await client.post("/large/upload", content=chunks(68))).status_code == 413
+
+
+def request_from(peer: str, forwarded: str | None = None) -> StarletteRequest:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return StarletteRequest(
+        {"type": "http", "headers": headers, "client": (peer, 1234)}
+    )
+
+
+def test_client_address_behind_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(
+        limiter,
+        "trusted_proxies",
+        [ipaddress.ip_network("10.0.0.0/8"), ipaddress.ip_network("127.0.0.1/32")],
+    )
+
+    # Untrusted peers can't claim another address
+    assert get_client_address(request_from("203.0.113.9", "1.2.3.4")) == "203.0.113.9"
+    # The header is walked from the right, skipping trusted hops
+    assert (
+        get_client_address(request_from("127.0.0.1", "1.2.3.4, 198.51.100.7, 10.0.0.2"))
+        == "198.51.100.7"
+    )
+    assert get_client_address(request_from("10.0.0.1", "10.0.0.2")) == "10.0.0.1"
+    assert get_client_address(request_from("10.0.0.1")) == "10.0.0.1"
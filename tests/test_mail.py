@@ -0,0 +1,137 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from Services.Config.config import config
+from Services.Mail.mail import MailQueue, SMTPConnection
+
+pytestmark = pytest.mark.anyio
+
+
+class Handler:
+    def __init__(self) -> None:
+        self.messages: list[str] = []
+        self.delay = 0.0
+        # Set from the server's own thread
+        self.started = threading.Event()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("nobody@"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.started.set()
+        await asyncio.sleep(self.delay)
+        self.messages.append(envelope.rcpt_tos[0])
+        return "250 Message accepted"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class Server:
+    def __init__(self) -> None:
+        self.handler = Handler()
+        self.port = free_port()
+        self.controller = self._start()
+
+    def _start(self) -> Controller:
+        controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        controller.start()
+        return controller
+
+    def restart(self) -> None:
+        # Drops every open connection
+        self.controller.stop()
+        self.controller = self._start()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = Server()
+    monkeypatch.setattr(config.email, "host", "127.0.0.1")
+    monkeypatch.setattr(config.email, "port", server.port)
+    monkeypatch.setattr(config.email, "use_ssl", False)
+    monkeypatch.setattr(config.email, "password", "")
+    yield server
+    server.controller.stop()
+
+
+async def deliver(queue: MailQueue, *addrs: str) -> None:
+    for addr in addrs:
+        queue.enqueue(addr, "Subject", "<p>Body</p>")
+    async with asyncio.timeout(10):
+        await queue.queue.join()
+
+
+async def test_delivers_over_one_connection(server):
+    handler = server.handler
+    queue = MailQueue(workers=1, max_size=10, max_retries=3, retry_backoff=0.01)
+    queue.start()
+    try:
+        await deliver(queue, "a@example.com", "b@example.com")
+    finally:
+        await queue.stop()
+    assert handler.messages == ["a@example.com", "b@example.com"]
+    assert queue.snapshot()["sent"] == 2
+
+
+async def test_permanent_rejection_is_not_retried(server):
+    handler = server.handler
+    queue = MailQueue(workers=1, max_size=10, max_retries=3, retry_backoff=0.01)
+    queue.start()
+    try:
+        await deliver(queue, "nobody@example.com", "a@example.com")
+        await asyncio.sleep(0.1)
+    finally:
+        await queue.stop()
+    assert handler.messages == ["a@example.com"]
+    assert queue.snapshot()["failed"] == 1
+    assert queue.snapshot()["retried"] == 0
+
+
+async def test_reconnects_after_server_restart(server):
+    handler = server.handler
+    queue = MailQueue(workers=1, max_size=10, max_retries=3, retry_backoff=0.01)
+    queue.start()
+    try:
+        await deliver(queue, "a@example.com")
+        server.restart()
+        await deliver(queue, "b@example.com")
+    finally:
+        await queue.stop()
+    assert handler.messages == ["a@example.com", "b@example.com"]
+    assert queue.snapshot()["retried"] == 0
+
+
+async def test_stop_waits_for_running_send(server, monkeypatch):
+    handler = server.handler
+    handler.delay = 0.5
+    finished = threading.Event()
+    send = SMTPConnection.send
+
+    def tracked(self, msg):
+        send(self, msg)
+        finished.set()
+
+    monkeypatch.setattr(SMTPConnection, "send", tracked)
+    queue = MailQueue(workers=1, max_size=10, max_retries=3, retry_backoff=0.01)
+    queue.start()
+    queue.enqueue("a@example.com", "Subject", "<p>Body</p>")
+    await asyncio.to_thread(handler.started.wait)
+    await queue.stop()
+    assert finished.is_set()
+    assert handler.messages == ["a@example.com"]
@@ -0,0 +1,85 @@
+import pytest
+
+from Services.Cache import memory
+from Services.Cache.memory import MemoryCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(memory, "time", clock)
+    return clock
+
+
+def test_lru_evicts_least_recently_used():
+    cache = MemoryCache[int](max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.stats.evictions == 1
+
+
+def test_lfu_evicts_least_frequently_used():
+    cache = MemoryCache[int](max_entries=2, policy="lfu")
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    cache.set("c", 3)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+
+
+def test_lfu_keeps_the_incoming_entry():
+    cache = MemoryCache[int](max_entries=2, policy="lfu")
+    for key in ("a", "b"):
+        cache.set(key, 1)
+        cache.get(key)
+    cache.set("c", 3)
+
+    # The new entry replaces a hot one instead of evicting itself
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_ttl_expires_entries(clock):
+    cache = MemoryCache[int](max_entries=4, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+
+    clock.now += 11
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.expire("b", 5)
+    clock.now += 6
+    assert cache.get("b") is None
+
+
+def test_expired_entries_are_dropped_before_live_ones(clock):
+    cache = MemoryCache[int](max_entries=2, ttl=60, policy="lfu")
+    cache.set("stale", 1, ttl=5)
+    for _ in range(3):
+        cache.get("stale")
+    cache.set("live", 2)
+
+    clock.now += 6
+    cache.set("new", 3)
+
+    assert cache.get("live") == 2
+    assert cache.get("new") == 3
+    assert cache.stats.evictions == 0
@@ -0,0 +1,112 @@
+import pytest
+from fastapi import HTTPException
+
+from Models.comic import BaseComicInfo, SourceStatus
+from Models.requests import ComicSearchReq
+from Services.Cache import search
+from Services.Cache.cache import cache
+from Services.Cache.search import SearchCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    """Two sources with two pages of three comics, `shared` is listed by both."""
+    requests: list[tuple[str, int]] = []
+
+    def comics(src: str, page: int) -> list[BaseComicInfo]:
+        if page > 2:
+            return []
+        found = [
+            BaseComicInfo(
+                id=f"{src}-{page}-{i}", name=f"{src} {page} {i}", author=[src], cover=""
+            )
+            for i in range(3)
+        ]
+        if page == 1:
+            found[0] = BaseComicInfo(
+                id=f"{src}-shared", name="Shared", author=["Someone"], cover=""
+            )
+        return found
+
+    async def search_sources(pending, keyword, extras=None):
+        page = int((extras or {}).get("page", 1))
+        for src in pending:
+            requests.append((src, page))
+            found = comics(src, page)
+            yield src, SourceStatus(status="ok", count=len(found)), found
+
+    monkeypatch.setattr(search, "search_sources", search_sources)
+    return requests
+
+
+def request(**fields) -> ComicSearchReq:
+    return ComicSearchReq(sources=["a", "b"], keyword="test", **fields)
+
+
+async def test_pages_through_deduplicated_results(sources):
+    searches = SearchCache(ttl=60, max_limit=10, max_rounds=3)
+    seen: list[str] = []
+    cursor = None
+    while True:
+        result = await searches.search(request(limit=4, cursor=cursor))
+        seen.extend(comic.id for comic in result.comics)
+        if (cursor := result.next_cursor) is None:
+            break
+
+    # b's copy of the shared comic is dropped, nothing repeats across pages
+    assert len(seen) == len(set(seen)) == 11
+    assert "b-shared" not in seen
+    assert seen[:3] == ["a-shared", "a-1-1", "a-1-2"]
+    # Sources are only asked for a page once
+    assert sorted(sources) == [
+        ("a", 1),
+        ("a", 2),
+        ("a", 3),
+        ("b", 1),
+        ("b", 2),
+        ("b", 3),
+    ]
+
+
+async def test_unpaged_search_is_a_single_round(sources):
+    searches = SearchCache(ttl=60, max_limit=10, max_rounds=3)
+    result = await searches.search(request())
+
+    assert len(result.comics) == 5
+    assert result.next_cursor is None
+    assert sources == [("a", 1), ("b", 1)]
+
+
+async def test_expired_search(sources):
+    searches = SearchCache(ttl=60, max_limit=10, max_rounds=3)
+    result = await searches.search(request(limit=2))
+    assert result.next_cursor is not None
+
+    await cache.delete(result.next_cursor.rsplit(".", 1)[0], namespace="search")
+    with pytest.raises(HTTPException) as e:
+        await searches.search(request(limit=2, cursor=result.next_cursor))
+    assert e.value.status_code == 410
+
+
+async def test_rejects_foreign_cursors_and_limits(sources):
+    searches = SearchCache(ttl=60, max_limit=10, max_rounds=3)
+    result = await searches.search(request(limit=2))
+
+    other = ComicSearchReq(
+        sources=["a"], keyword="other", limit=2, cursor=result.next_cursor
+    )
+    with pytest.raises(HTTPException) as e:
+        await searches.search(other)
+    assert e.value.status_code == 400
+
+    for bad in (request(limit=11), request(limit=2, cursor="garbage")):
+        with pytest.raises(HTTPException) as e:
+            await searches.search(bad)
+        assert e.value.status_code == 400
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from Models.user import UserData
+from Services.Modulator.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def test_key_normalizes_arguments():
+    flights = SingleFlight(["search"])
+
+    assert flights.key("search", (" one piece ",), {}) == flights.key(
+        "search", ("one piece",), {}
+    )
+    assert flights.key("search", ("a",), {"x": [1]}) == flights.key(
+        "search", ("a",), {"x": (1,)}
+    )
+    assert flights.key("login", ("a",), {}) is None
+    assert flights.key("search", (UserData("user"),), {}) is None
+
+
+async def test_concurrent_calls_share_one_flight():
+    flights = SingleFlight(["search"])
+    calls = 0
+
+    async def call() -> list[str]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ["result"]
+
+    key = flights.key("search", ("keyword",), {})
+    results = await asyncio.gather(*(flights.do(key, call) for _ in range(5)))
+
+    assert calls == 1
+    assert results == [["result"]] * 5
+    assert flights.coalesced == 4
+    assert flights.snapshot()["in_flight"] == 0
+
+
+async def test_errors_reach_every_waiter_and_arent_kept():
+    flights = SingleFlight(["search"])
+    calls = 0
+
+    async def call() -> None:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream is down")
+
+    key = flights.key("search", ("keyword",), {})
+    results = await asyncio.gather(
+        *(flights.do(key, call) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    with pytest.raises(RuntimeError):
+        await flights.do(key, call)
+    assert calls == 2
+
+
+async def test_cancelled_caller_doesnt_fail_the_others():
+    flights = SingleFlight(["search"])
+
+    async def call() -> str:
+        await asyncio.sleep(0.02)
+        return "result"
+
+    key = flights.key("search", ("keyword",), {})
+    first = asyncio.create_task(flights.do(key, call))
+    second = asyncio.create_task(flights.do(key, call))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "result"
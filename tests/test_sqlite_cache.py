@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+from aiocache.serializers import JsonSerializer
+
+from Services.Cache.sqlite import SQLiteCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def cache(tmp_path):
+    cache = SQLiteCache(path=str(tmp_path / "cache.db"), serializer=JsonSerializer())
+    yield cache
+    await cache.close()
+
+
+async def test_reads_dont_wait_for_writers(cache):
+    await cache.set("key", {"value": 1})
+    # Another worker process holding the write lock
+    writer = sqlite3.connect(cache.path, isolation_level=None, timeout=0)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        assert await cache.get("key") == {"value": 1}
+        assert await cache.exists("key")
+        assert await cache.multi_get(["key", "missing"]) == [{"value": 1}, None]
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+
+async def test_read_modify_write(cache):
+    assert await cache.increment("counter", 2) == 2
+    assert await cache.increment("counter", 3) == 5
+    await cache.add("added", "value")
+    with pytest.raises(ValueError):
+        await cache.add("added", "other")
+    assert await cache.expire("added", 60)
+    assert not await cache.expire("missing", 60)